@@ -21,4 +21,13 @@ class AGOLUser:
         print('\nLogging in to ArcGIS Online...')
         self.gis = GIS("https://www.arcgis.com", username, password)     
         print('Logged in as ' + str(self.gis.properties.user.username) + '\n')
-                
+
+
+class LocalUser:
+    ''' Stands in for AGOLUser where only the working directory is needed, e.g. when 
+         benchmarking get_data() against replay_server.py. Does not log in. '''
+
+    def __init__(self, working_dir=''):
+        self.username = ''
+        self.working_dir = working_dir or os.getcwd()
+        self.gis = ''
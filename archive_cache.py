@@ -0,0 +1,175 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import glob
+import json
+import os
+import threading
+import time
+
+
+# Related third party imports
+
+
+# Local application imports
+
+
+class ArchiveCache:
+    ''' Local cache of downloaded bulk archives, shared by every GeoData object that
+         uses the same working directory.
+        Archives are content addressed: each is stored once as <sha256><extension>,
+         however many URLs or dataobjects refer to it. Each URL entry records the
+         archive's sha256 together with the ETag and Last-Modified headers returned
+         with it, so that the next request for that URL can be made conditional
+         (If-None-Match / If-Modified-Since), and when it was last checked, so that
+         requests within max_age seconds can skip the server altogether.
+        When the archives total more than max_bytes, the least recently used are
+         evicted, together with any files derived from them: files in a subfolder of 
+         the cache named <sha256>.<anything>, e.g. Parquet copies of their members. 
+         The index is a json file in the cache folder. '''
+
+    index_filename = 'archive_cache.json'
+
+
+    def __init__(self, cache_dir, max_bytes, max_age):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_file = os.path.join(cache_dir, ArchiveCache.index_filename)
+        self.lock = threading.Lock() # Archives may be downloaded concurrently
+        self.index = {'urls': {}, 'archives': {}}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.isfile(self.index_file):
+            with open(self.index_file, 'r') as input_file:
+                index = json.load(input_file)
+            if 'urls' in index and 'archives' in index: # Ignore older index formats
+                self.index = index
+
+
+    def get(self, url):
+        # Return the cache entry for <url>, or None if its archive is not on disk
+        with self.lock:
+            entry = self.index['urls'].get(url)
+            if entry is None or entry['sha256'] not in self.index['archives']:
+                return None
+            entry = dict(entry, **self.index['archives'][entry['sha256']])
+        if not os.path.isfile(self.archive_path(entry)):
+            return None
+        return entry
+
+
+    def archive_path(self, entry):
+        return os.path.join(self.cache_dir, entry['archive'])
+
+
+    def is_fresh(self, entry):
+        # True if <entry> was checked against the server within the last max_age seconds
+        return time.time() - entry['checked'] < self.max_age
+
+
+    def validators(self, url):
+        # Headers which turn a request for <url> into a conditional GET
+        entry = self.get(url)
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+
+    def store(self, url, downloaded_file, response_headers, sha256):
+        ''' Move <downloaded_file> into the cache as the archive for <url>, recording
+             its validators, and return its entry, as get() would. If an identical
+             archive is already cached, <downloaded_file> is discarded instead.
+            NB The entry is returned rather than looked up again, since another 
+             download may evict it from the index as soon as self.lock is released. '''
+        archive = sha256 + os.path.splitext(url)[1]
+        archive_path = os.path.join(self.cache_dir, archive)
+        with self.lock:
+            if os.path.isfile(archive_path):
+                os.remove(downloaded_file)
+            else:
+                os.replace(downloaded_file, archive_path)
+            self.index['archives'][sha256] = {'archive': archive,
+                                              'size': os.path.getsize(archive_path),
+                                              'last_used': time.time()}
+            self.index['urls'][url] = {'sha256': sha256,
+                                       'etag': response_headers.get('ETag', ''),
+                                       'last_modified': response_headers.get('Last-Modified', ''),
+                                       'checked': time.time(),
+                                       'extracted_to': '',
+                                       'extracted_sha256': ''}
+            entry = dict(self.index['urls'][url], **self.index['archives'][sha256])
+            self.evict(keep=sha256)
+            self.save()
+        return entry
+
+
+    def touch(self, url, checked=False):
+        # Record that the archive for <url> has been used (and re-validated if <checked>)
+        with self.lock:
+            entry = self.index['urls'].get(url)
+            if entry is None: # Evicted meanwhile by another download
+                return
+            self.index['archives'][entry['sha256']]['last_used'] = time.time()
+            if checked:
+                entry['checked'] = time.time()
+            self.save()
+
+
+    def set_extracted_to(self, url, to_location, sha256):
+        # Record where, and which version <sha256> of, the archive for <url> was last extracted
+        with self.lock:
+            entry = self.index['urls'].get(url)
+            if entry is None: # Evicted meanwhile by another download
+                return
+            entry['extracted_to'] = to_location
+            entry['extracted_sha256'] = sha256
+            self.save()
+
+
+    def evict(self, keep):
+        ''' Delete least recently used archives, other than <keep>, until the cache
+             holds no more than max_bytes. NB caller holds self.lock '''
+        archives = self.index['archives']
+        total = sum(archive['size'] for archive in archives.values())
+
+        for sha256 in sorted(archives, key=lambda sha256: archives[sha256]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if sha256 == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, archives[sha256]['archive']))
+            except FileNotFoundError:
+                pass
+            except OSError: # e.g. still open on Windows
+                continue
+            self.remove_derived_files(sha256)
+            print(f"\nEvicted {archives[sha256]['archive']} from archive cache.")
+            total -= archives[sha256]['size']
+            del archives[sha256]
+
+        # Forget URLs whose archive has gone
+        self.index['urls'] = {url: entry for (url, entry) in self.index['urls'].items()
+                              if entry['sha256'] in archives}
+
+
+    def remove_derived_files(self, sha256):
+        # Delete the files derived from archive <sha256>, in subfolders of the cache
+        for derived_file in glob.glob(os.path.join(glob.escape(self.cache_dir), '*', sha256 + '.*')):
+            try:
+                os.remove(derived_file)
+            except OSError: # Removed meanwhile, or still open on Windows
+                pass
+
+
+    def save(self):
+        # NB caller holds self.lock
+        temp_file = self.index_file + '.tmp'
+        with open(temp_file, 'w') as output_file:
+            json.dump(self.index, output_file, indent=1)
+        os.replace(temp_file, self.index_file)
@@ -73,11 +73,8 @@ def validate(args: List[str]):
     return arguments
 
 
-def create_f_service(args):
-    # Create AGOLUser object
-    user_obj = AGOLUser(args.username, args.password)
-
-    # Create GeoData object
+def create_geodata_obj(args, user_obj):
+    # Create the GeoData object for args.datasource and args.dataobject
     if args.datasource == "EA_survey_sites" and args.dataobject == "fish":
         geodata_obj = EASurveySitesFish(args.datasource, args.dataobject, user_obj)
     elif args.datasource == "EA_survey_sites" and args.dataobject == "fish_history":
@@ -134,6 +131,21 @@ def create_f_service(args):
         print("Unable to create GeoData object\n")
         raise SystemExit()
 
+    return geodata_obj
+
+
+def create_f_service(args):
+    # Create AGOLUser object
+    user_obj = AGOLUser(args.username, args.password)
+
+    # A comma separated list of species is handled as one batch
+    if args.datasource == "NBNatlas_occurrences" and "," in args.dataobject:
+        create_f_services_batch(args, user_obj)
+        return
+
+    # Create GeoData object
+    geodata_obj = create_geodata_obj(args, user_obj)
+
     print(geodata_obj)
     print(f"Object name: {geodata_obj.name}")
 
@@ -143,6 +155,7 @@ def create_f_service(args):
         raise SystemExit()
 
     geodata_obj.get_data()
+    GeoData.print_http_stats()
     geodata_obj.process_data()
     geodata_obj.create_geojson_file()
     geodata_obj.add_data_item()
@@ -152,6 +165,36 @@ def create_f_service(args):
     print("\nDone!\n")
 
 
+def create_f_services_batch(args, user_obj):
+    ''' Create a feature service for each species in the comma separated 
+         args.dataobject, in one process: occurrences of every species are got 
+         concurrently, and their catchments determined in one spatial join. '''
+    species_list = [species.strip() for species in args.dataobject.split(",") if species.strip()]
+    geodata_objs = [NBNatlasOccurrences(args.datasource, species, user_obj) 
+                    for species in species_list]
+
+    # Check feature service items of given names don't already exist, before any work
+    existing = [geodata_obj.name for geodata_obj in geodata_objs 
+                if geodata_obj.check_item_already_exists() == True]
+    if existing:
+        print(f"\nItems already exist for: {existing}")
+        print("Either delete items, remove these species or run overwrite_feature_service.py instead")
+        raise SystemExit()
+
+    NBNatlasOccurrences.get_data_batch(geodata_objs)
+    GeoData.print_http_stats()
+    NBNatlasOccurrences.process_data_batch(geodata_objs)
+
+    for geodata_obj in geodata_objs:
+        print(f"\nObject name: {geodata_obj.name}")
+        geodata_obj.create_geojson_file()
+        geodata_obj.add_data_item()
+        geodata_obj.publish_f_layer()
+        geodata_obj.publish_f_layer_view()
+
+    print("\nDone!\n")
+
+
 def main() -> None:
     args = sys.argv[1:]
     if not args:
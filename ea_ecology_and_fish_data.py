@@ -1,6 +1,24 @@
-from geo_data import GeoData
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import concurrent.futures
+import csv
+import glob
+import io
+import os
+import zipfile
+
+# Related third party imports
 import osgb # need to do a 'pip3 install osgb' from command line
 from arcgis.features import FeatureLayerCollection
+import pandas
+try:
+    import pyarrow # Needed for Parquet staging - 'conda install pyarrow' if missing
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Local application imports
+from geo_data import GeoData
 
 
 ''' 
@@ -12,8 +30,25 @@ used to construct a class object
 
 class EAEcologyAndFishData(GeoData):
     
-    # Define a class attribute:
+    # Define class attributes:
     fish_and_bio_url = 'https://environment.data.gov.uk/ecology/explorer/downloads/'
+    use_archive_cache = True # Only re-download archives the EA has republished
+    extract_archives = False # If False, csv files are read straight from the zip archives
+    max_download_workers = 3 # Bulk archives downloaded at once by get_datafiles()
+    stage_parquet = True # Convert each csv file once to typed Parquet, see stage_datafile()
+    staging_dirname = 'parquet_staging'
+    # Types given to columns of the bulk csv files when staged. Other columns stay str
+    staging_dtypes = {'SITE_ID': 'category',
+                      'SURVEY_ID': 'category',
+                      'FULL_EASTING': 'float64',
+                      'FULL_NORTHING': 'float64',
+                      'SURVEY_RANKED_EASTING': 'float64',
+                      'SURVEY_RANKED_NORTHING': 'float64'}
+    staging_date_columns = ['MIN_SAMPLE_DATE',
+                            'MAX_SAMPLE_DATE',
+                            'SAMPLE_DATE',
+                            'DATE_OF_ANALYSIS',
+                            'EVENT_DATE']
     
 
     def download_and_extract(self, file):     
@@ -22,7 +57,207 @@ class EAEcologyAndFishData(GeoData):
         datafile = super().download_and_extract(EAEcologyAndFishData.fish_and_bio_url, file)
         
         return datafile
+
+
+    def get_datafile(self, zip_file, filename):
+        ''' Download <zip_file> and return a reference to its member <filename>: 
+             either the path of the extracted csv file or, if extract_archives is 
+             False, a zipfile.Path so that only that member is ever decompressed. '''
+        if self.extract_archives:
+            return self.download_and_extract(zip_file) + filename
+
+        archive = super().download_archive(EAEcologyAndFishData.fish_and_bio_url, zip_file)
+        print(f'\nReading {filename} directly from:\n{archive}')
+
+        return zipfile.Path(archive, at=filename)
+
+
+    def get_datafiles(self, members):
+        ''' Call get_datafile() for each (zip_file, filename) in <members> using a 
+             bounded pool of threads, since the downloads are independent and network 
+             bound. Returns the datafiles in the same order as <members>. '''
+        datafiles = [None] * len(members)
+        failures = []
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=EAEcologyAndFishData.max_download_workers) as executor:
+            futures = {executor.submit(self.get_datafile, zip_file, filename): index 
+                       for (index, (zip_file, filename)) in enumerate(members)}
+
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    datafiles[index] = future.result()
+                except BaseException as error: # Includes SystemExit raised on failure
+                    failures.append((members[index][0], error))
+
+        if failures:
+            for (zip_file, error) in failures:
+                print(f'\nFailed to get {zip_file}: {error!r}')
+            raise SystemExit()
+
+        return datafiles
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def open_datafile(datafile):
+        # Open a datafile returned by get_datafile() as a binary stream
+        if isinstance(datafile, zipfile.Path):
+            return datafile.open('rb')
+        return open(datafile, 'rb')
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def read_datafile(datafile, columns_required, dtypes=None, date_columns=None):
+        ''' Read <columns_required> of a datafile returned by get_datafile() into a 
+             dataframe, typed using the calling class's <dtypes> map (e.g. float64 or 
+             category; other columns are str) and with <date_columns> parsed. 
+            If stage_parquet is True, the columns are read from the file's typed Parquet 
+             copy, creating it if necessary. Otherwise the csv file is parsed with 
+             pyarrow's multi-threaded reader, or pandas' if pyarrow isn't installed. '''
+        dtypes = dtypes or {}
+        date_columns = date_columns or []
         
+        if EAEcologyAndFishData.stage_parquet and pyarrow is not None:
+            staged_file = EAEcologyAndFishData.stage_datafile(datafile)
+            dataframe = pandas.read_parquet(staged_file, columns=columns_required)
+        elif pyarrow is not None:
+            dataframe = EAEcologyAndFishData.arrow_read_csv(datafile, columns_required)
+        else:
+            with EAEcologyAndFishData.open_datafile(datafile) as input_file:
+                dataframe = pandas.read_csv(input_file, 
+                                            usecols=columns_required, 
+                                            dtype=str)
+
+        return EAEcologyAndFishData.type_columns(dataframe, dtypes, date_columns)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def read_datafile_chunks(datafile, columns_required, chunk_size, dtypes=None, date_columns=None):
+        ''' As read_datafile(), but yield the dataframe <chunk_size> rows at a time so 
+             that only one chunk is in memory. Each chunk is read from the same source, 
+             and typed in the same way, as read_datafile() reads the whole file. '''
+        dtypes = dtypes or {}
+        date_columns = date_columns or []
+
+        if EAEcologyAndFishData.stage_parquet and pyarrow is not None:
+            staged_file = EAEcologyAndFishData.stage_datafile(datafile)
+            batches = pyarrow.parquet.ParquetFile(staged_file).iter_batches(batch_size=chunk_size, 
+                                                                            columns=columns_required)
+            for batch in batches:
+                yield EAEcologyAndFishData.type_columns(batch.to_pandas(), dtypes, date_columns)
+        elif pyarrow is not None:
+            with EAEcologyAndFishData.open_datafile(datafile) as input_file:
+                reader = pyarrow.csv.open_csv(input_file, 
+                                              read_options=pyarrow.csv.ReadOptions(use_threads=True), 
+                                              convert_options=EAEcologyAndFishData.arrow_convert_options(columns_required))
+                batches = []
+                num_rows = 0
+                for batch in reader:
+                    batches.append(batch)
+                    num_rows += batch.num_rows
+                    if num_rows >= chunk_size:
+                        chunk = pyarrow.Table.from_batches(batches).to_pandas()
+                        (batches, num_rows) = ([], 0)
+                        yield EAEcologyAndFishData.type_columns(chunk, dtypes, date_columns)
+                if batches:
+                    chunk = pyarrow.Table.from_batches(batches).to_pandas()
+                    yield EAEcologyAndFishData.type_columns(chunk, dtypes, date_columns)
+        else:
+            with EAEcologyAndFishData.open_datafile(datafile) as input_file:
+                for chunk in pandas.read_csv(input_file, 
+                                             usecols=columns_required, 
+                                             dtype=str, 
+                                             chunksize=chunk_size):
+                    yield EAEcologyAndFishData.type_columns(chunk, dtypes, date_columns)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def arrow_convert_options(columns):
+        # Read <columns> as strings, with empty values as null
+        return pyarrow.csv.ConvertOptions(
+            include_columns=columns,
+            column_types={column: pyarrow.string() for column in columns},
+            strings_can_be_null=True)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def arrow_read_csv(datafile, columns=None):
+        ''' Read <columns> (default all) of a datafile as strings using pyarrow's 
+             multi-threaded csv reader. Strings are kept as read, e.g. IDs keep any 
+             leading zeros, and empty values become null as with pandas.read_csv. '''
+        if columns is None:
+            with EAEcologyAndFishData.open_datafile(datafile) as input_file:
+                header = io.TextIOWrapper(input_file, encoding='utf-8-sig').readline()
+            columns = next(csv.reader([header]))
+
+        with EAEcologyAndFishData.open_datafile(datafile) as input_file:
+            table = pyarrow.csv.read_csv(input_file, 
+                                         read_options=pyarrow.csv.ReadOptions(use_threads=True), 
+                                         convert_options=EAEcologyAndFishData.arrow_convert_options(columns))
+
+        return table.to_pandas()
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def type_columns(dataframe, dtypes, date_columns):
+        # Parse <date_columns> and convert other columns as given in <dtypes>
+        for column in dataframe.columns:
+            if column in date_columns:
+                if not pandas.api.types.is_datetime64_any_dtype(dataframe[column]):
+                    dataframe[column] = pandas.to_datetime(dataframe[column], errors='coerce')
+            elif dtypes.get(column, str) == 'float64':
+                dataframe[column] = \
+                    pandas.to_numeric(dataframe[column], errors='coerce').astype('float64')
+            elif dtypes.get(column, str) != str:
+                dataframe[column] = dataframe[column].astype(dtypes[column])
+
+        return dataframe
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def stage_datafile(datafile):
+        ''' Return the path of a typed Parquet copy of <datafile>, converting the csv 
+             file if there isn't an up to date one. Dates become datetime64, eastings 
+             and northings float64 and IDs categorical (see staging_dtypes), so the csv 
+             file is parsed once per download rather than once per run.
+            A member of an archive in the archive cache is staged next to the cache as 
+             <archive sha256>.<member>.parquet, so a new version of the archive gets a 
+             new copy, and the copy is deleted when the archive is evicted from the 
+             cache. An extracted csv file is staged alongside itself. '''
+        if isinstance(datafile, zipfile.Path):
+            archive = datafile.root.filename
+            staging_dir = os.path.join(os.path.dirname(archive), 
+                                       EAEcologyAndFishData.staging_dirname)
+            member = os.path.splitext(datafile.name)[0]
+            key = os.path.splitext(os.path.basename(archive))[0]
+            staged_file = os.path.join(staging_dir, f'{key}.{member}.parquet')
+            source_mtime = os.path.getmtime(archive)
+        else:
+            staging_dir = os.path.dirname(datafile)
+            member = os.path.splitext(os.path.basename(datafile))[0]
+            staged_file = os.path.join(staging_dir, f'{member}.parquet')
+            source_mtime = os.path.getmtime(datafile)
+
+        if os.path.isfile(staged_file) and os.path.getmtime(staged_file) >= source_mtime:
+            return staged_file
+
+        print(f'\nStaging {datafile} as Parquet:\n{staged_file}\n')
+        dataframe = EAEcologyAndFishData.type_columns(
+            EAEcologyAndFishData.arrow_read_csv(datafile),
+            EAEcologyAndFishData.staging_dtypes,
+            EAEcologyAndFishData.staging_date_columns)
+
+        # Remove copies staged from older versions of the same archive
+        os.makedirs(staging_dir, exist_ok=True)
+        for old_file in glob.glob(os.path.join(staging_dir, f'*.{member}.parquet')):
+            os.remove(old_file)
+
+        dataframe.to_parquet(staged_file + '.tmp', engine='pyarrow', index=False)
+        os.replace(staged_file + '.tmp', staged_file)
+
+        return staged_file
+
 
     def easting_northing_to_wgs84(self):
         print('\nConverting easting-northing to lat-long...\n')
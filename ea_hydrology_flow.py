@@ -1,5 +1,4 @@
 # Standard library imports (https://docs.python.org/3/py-modindex.html)
-import json
 import math
 import re
 
@@ -7,7 +6,6 @@ import re
 import geopandas
 import osgb # need to do a 'pip3 install osgb' from command line
 import pandas
-import requests
 from shapely.wkt import loads
 from shapely import wkt
 
@@ -26,6 +24,17 @@ class EAHydrologyFlow(GeoData):
     # Define class attributes:
     url_records =  'https://environment.data.gov.uk/hydrology/id/stations'
     occurrences_list_of_dicts = []
+    # Fields of each item kept as the response streams in - those used by construct_df()
+    items_fields = ['@id',
+                    'label',
+                    'lat',
+                    'long',
+                    'notation',
+                    'riverName',
+                    'dateOpened',
+                    'dateClosed',
+                    'observedProperty',
+                    'status']
     '''
     Get 1st 10000 sampling points
     https://environment.data.gov.uk/hydrology/id/sampling-point?_limit=10000
@@ -35,64 +44,15 @@ class EAHydrologyFlow(GeoData):
                 
     def get_data(self): # Using Water Quality Archive API  
     
-        '''
-        TRIED GETTING DATA IN A 'ONER', AND '10000 AT A TIME'. BOTH RETURN 61228 SAMPLING POINTS DESPITE 
-        DISCREPENCY BETWEEN NUMBER OF ITEMS REQUESTED AND NUMBER RETURNED IN '10000 AT A TIME' METHOD.
-        16/06/2022
-        '''
-        # Get data, in one go (assuming not more than 100000 items)
+        # Get data, items_page_size items at a time, several pages at once
         # Use dissolved-oxygen as proxy for getting water quality sampling points
-        url = EAHydrologyFlow.url_records + '?observedProperty=waterFlow&_limit=100000' # Get 100000 sampling points
+        url = EAHydrologyFlow.url_records + '?observedProperty=waterFlow'
         print(f'\nGetting {self.dataobject} data ' \
               f'from EA Hydrology API:\n{url}\n')
-        occurrences_response = requests.get(f'{url}')
-
-        num_observations = len(json.loads(occurrences_response.text)['items'])
-
         EAHydrologyFlow.occurrences_list_of_dicts = \
-            json.loads(occurrences_response.text)['items'] 
- 
-        num_downloaded = len(json.loads(occurrences_response.text)['items']) 
-        total_num_downloaded = num_downloaded
-        print(f'Total number of items downloaded: {total_num_downloaded}')
+            GeoData.get_all_items(url, EAHydrologyFlow.items_fields)
 
-        '''
-        # Get data, num_returned_max at a time
-        num_returned_max = 10000
-        page_size = num_returned_max
-        start_index = 0
-        total_num_downloaded = 0
-        done = False
-        
-        while not done:
-        
-            url = \
-                EAWaterQualArchives.url_records \
-                    + '?_limit=' \
-                    + str(num_returned_max) \
-                    + '&_offset=' \
-                    + str(start_index)
-
-            print(f'\nGetting {self.dataobject} data ' \
-                  f'from EA Water Quality Archive API:\n{url}\n')
-            occurrences_response = requests.get(f'{url}')
-            
-            #print(f"json.loads(occurrences_response.text)['items']: {json.loads(occurrences_response.text)['items']}")
-            
-            # Join any downloaded occurrences to EAWaterQualArchives.occurrences_list_of_dicts
-            EAWaterQualArchives.occurrences_list_of_dicts = \
-                EAWaterQualArchives.occurrences_list_of_dicts \
-                    + json.loads(occurrences_response.text)['items'] 
-                                      
-            num_downloaded = len(json.loads(occurrences_response.text)['items']) 
-            total_num_downloaded += num_downloaded
-            print(f'Number of items downloaded: {num_downloaded}')
-            print(f'Total number of items downloaded: {total_num_downloaded}')
-                       
-            start_index += num_returned_max
-            if num_downloaded == 0:
-                done = True
-        '''
+        total_num_downloaded = len(EAHydrologyFlow.occurrences_list_of_dicts)
         
         if (total_num_downloaded == 0):
             print(f'No data found.')        
@@ -26,25 +26,27 @@ class EASurveySitesBiosys(EAEcologyAndFishData):
     inv_datafile = ''
     macp_datafile = ''
     diat_datafile = ''
+    # Types of csv columns read by construct_df(). Other columns are read as str
+    csv_dtypes = {'WATER_BODY': 'category', 
+                  'SITE_ID': 'category', 
+                  'FULL_EASTING': 'float64', 
+                  'FULL_NORTHING': 'float64'}
+    csv_date_columns = ['MAX_SAMPLE_DATE']
    
    
     def get_data(self):
      
-        ''' Download and extract EA Freshwater river macroinvertevrate surveys (Biosys) data 
-                - see superclass for url '''        
-        EASurveySitesBiosys.inv_datafile = \
-            super().download_and_extract(EASurveySitesBiosys.inv_zipfile) \
-                + EASurveySitesBiosys.inv_filename
-
-        # Download and extract EA Freshwater river macrophyte surveys (Biosys) data 
-        EASurveySitesBiosys.macp_datafile = \
-            super().download_and_extract(EASurveySitesBiosys.macp_zipfile) \
-                + EASurveySitesBiosys.macp_filename
-
-        # Download and extract EA Freshwater river diatom surveys (Biosys) data 
-        EASurveySitesBiosys.diat_datafile = \
-            super().download_and_extract(EASurveySitesBiosys.diat_zipfile) \
-                + EASurveySitesBiosys.diat_filename
+        ''' Download EA Freshwater river macroinvertevrate, macrophyte and diatom 
+             surveys (Biosys) data concurrently - see superclass for url '''        
+        members = [(EASurveySitesBiosys.inv_zipfile, 
+                    EASurveySitesBiosys.inv_filename), 
+                   (EASurveySitesBiosys.macp_zipfile, 
+                    EASurveySitesBiosys.macp_filename), 
+                   (EASurveySitesBiosys.diat_zipfile, 
+                    EASurveySitesBiosys.diat_filename)]
+        (EASurveySitesBiosys.inv_datafile, 
+         EASurveySitesBiosys.macp_datafile, 
+         EASurveySitesBiosys.diat_datafile) = super().get_datafiles(members)
 
               
     def process_data(self):
@@ -81,9 +83,10 @@ class EASurveySitesBiosys(EAEcologyAndFishData):
                             'FULL_EASTING', 
                             'FULL_NORTHING', 
                             'MAX_SAMPLE_DATE']
-        dataframe = pandas.read_csv(file, 
-                                    usecols=columns_required, 
-                                    dtype=str)
+        dataframe = EAEcologyAndFishData.read_datafile(file, 
+                                                       columns_required, 
+                                                       EASurveySitesBiosys.csv_dtypes, 
+                                                       EASurveySitesBiosys.csv_date_columns)
                                     
         # Sort on site_id 
         dataframe = dataframe.sort_values(['SITE_ID'], 
@@ -26,25 +26,27 @@ class EASurveySitesSampleBiosys(EAEcologyAndFishData):
     inv_datafile = ''
     macp_datafile = ''
     diat_datafile = ''
+    # Types of csv columns read by construct_df(). Other columns are read as str
+    csv_dtypes = {'WATER_BODY': 'category', 
+                  'SITE_ID': 'category', 
+                  'FULL_EASTING': 'float64', 
+                  'FULL_NORTHING': 'float64'}
+    csv_date_columns = ['MIN_SAMPLE_DATE', 'MAX_SAMPLE_DATE']
    
    
     def get_data(self):
      
-        ''' Download and extract EA Freshwater river macroinvertevrate surveys (Biosys) data 
-                - see superclass for url '''        
-        EASurveySitesSampleBiosys.inv_datafile = \
-            super().download_and_extract(EASurveySitesSampleBiosys.inv_zipfile) \
-                + EASurveySitesSampleBiosys.inv_filename
-
-        # Download and extract EA Freshwater river macrophyte surveys (Biosys) data 
-        EASurveySitesSampleBiosys.macp_datafile = \
-            super().download_and_extract(EASurveySitesSampleBiosys.macp_zipfile) \
-                + EASurveySitesSampleBiosys.macp_filename
-
-        # Download and extract EA Freshwater river diatom surveys (Biosys) data 
-        EASurveySitesSampleBiosys.diat_datafile = \
-            super().download_and_extract(EASurveySitesSampleBiosys.diat_zipfile) \
-                + EASurveySitesSampleBiosys.diat_filename
+        ''' Download EA Freshwater river macroinvertevrate, macrophyte and diatom 
+             surveys (Biosys) data concurrently - see superclass for url '''        
+        members = [(EASurveySitesSampleBiosys.inv_zipfile, 
+                    EASurveySitesSampleBiosys.inv_filename), 
+                   (EASurveySitesSampleBiosys.macp_zipfile, 
+                    EASurveySitesSampleBiosys.macp_filename), 
+                   (EASurveySitesSampleBiosys.diat_zipfile, 
+                    EASurveySitesSampleBiosys.diat_filename)]
+        (EASurveySitesSampleBiosys.inv_datafile, 
+         EASurveySitesSampleBiosys.macp_datafile, 
+         EASurveySitesSampleBiosys.diat_datafile) = super().get_datafiles(members)
 
               
     def process_data(self):
@@ -83,9 +85,10 @@ class EASurveySitesSampleBiosys(EAEcologyAndFishData):
                             'COUNT_OF_SAMPLES',
                             'MIN_SAMPLE_DATE', 
                             'MAX_SAMPLE_DATE']
-        dataframe = pandas.read_csv(file, 
-                                    usecols=columns_required, 
-                                    dtype=str)
+        dataframe = EAEcologyAndFishData.read_datafile(file, 
+                                                       columns_required, 
+                                                       EASurveySitesSampleBiosys.csv_dtypes, 
+                                                       EASurveySitesSampleBiosys.csv_date_columns)
                                     
         # Sort on site_id 
         dataframe = dataframe.sort_values(['SITE_ID'], 
@@ -26,25 +26,33 @@ class EASurveySitesBiosysODM(EAEcologyAndFishData):
     inv_datafile = ''
     macp_datafile = ''
     diat_datafile = ''
+    # Types of csv columns read by construct_df(). Other columns are read as str
+    csv_dtypes = {'SITE_ID': 'category', 
+                  'SAMPLE_TYPE': 'category', 
+                  'SAMPLE_TYPE_DESCRIPTION': 'category', 
+                  'SAMPLE_METHOD': 'category', 
+                  'SAMPLE_METHOD_DESCRIPTION': 'category', 
+                  'SAMPLE_REASON': 'category', 
+                  'ANALYSIS_TYPE': 'category', 
+                  'ANALYSIS_TYPE_DESCRIPTION': 'category', 
+                  'ANALYSIS_METHOD': 'category', 
+                  'ANALYSIS_METHOD_DESCRIPTION': 'category'}
+    csv_date_columns = ['SAMPLE_DATE', 'DATE_OF_ANALYSIS']
    
    
     def get_data(self):
      
-        ''' Download and extract EA Freshwater river macroinvertevrate surveys (Biosys) data 
-                - see superclass for url '''        
-        EASurveySitesBiosysODM.inv_datafile = \
-            super().download_and_extract(EASurveySitesBiosysODM.inv_zipfile) \
-                + EASurveySitesBiosysODM.inv_filename
-
-        # Download and extract EA Freshwater river macrophyte surveys (Biosys) data 
-        EASurveySitesBiosysODM.macp_datafile = \
-            super().download_and_extract(EASurveySitesBiosysODM.macp_zipfile) \
-                + EASurveySitesBiosysODM.macp_filename
-
-        # Download and extract EA Freshwater river diatom surveys (Biosys) data 
-        EASurveySitesBiosysODM.diat_datafile = \
-            super().download_and_extract(EASurveySitesBiosysODM.diat_zipfile) \
-                + EASurveySitesBiosysODM.diat_filename
+        ''' Download EA Freshwater river macroinvertevrate, macrophyte and diatom 
+             surveys (Biosys) data concurrently - see superclass for url '''        
+        members = [(EASurveySitesBiosysODM.inv_zipfile, 
+                    EASurveySitesBiosysODM.inv_filename), 
+                   (EASurveySitesBiosysODM.macp_zipfile, 
+                    EASurveySitesBiosysODM.macp_filename), 
+                   (EASurveySitesBiosysODM.diat_zipfile, 
+                    EASurveySitesBiosysODM.diat_filename)]
+        (EASurveySitesBiosysODM.inv_datafile, 
+         EASurveySitesBiosysODM.macp_datafile, 
+         EASurveySitesBiosysODM.diat_datafile) = super().get_datafiles(members)
 
               
     def process_data(self):
@@ -91,9 +99,10 @@ class EASurveySitesBiosysODM(EAEcologyAndFishData):
                             'ANALYSIS_METHOD',
                             'ANALYSIS_METHOD_DESCRIPTION',
                             ]
-        dataframe = pandas.read_csv(file, 
-                                    usecols=columns_required, 
-                                    dtype=str)
+        dataframe = EAEcologyAndFishData.read_datafile(file, 
+                                                       columns_required, 
+                                                       EASurveySitesBiosysODM.csv_dtypes, 
+                                                       EASurveySitesBiosysODM.csv_date_columns)
                                     
         # Sort on site_id 
         dataframe = dataframe.sort_values(['SITE_ID'], 
@@ -23,6 +23,12 @@ class EASurveySitesFish(EAEcologyAndFishData):
     fish_zipfile = 'FW_Fish_Counts.zip' 
     fish_filename = 'FW_Fish_Counts.csv'
     fish_datafile = ''
+    # Types of csv columns read by construct_df(). Other columns are read as str
+    csv_dtypes = {'SITE_ID': 'category', 
+                  'SITE_NAME': 'category', 
+                  'SURVEY_RANKED_EASTING': 'float64', 
+                  'SURVEY_RANKED_NORTHING': 'float64'}
+    csv_date_columns = ['EVENT_DATE']
     
   
     def get_data(self):
@@ -30,8 +36,8 @@ class EASurveySitesFish(EAEcologyAndFishData):
         ''' Download and extract EA Freshwater fish counts (NFPD) data 
                 - see superclass for url '''
         EASurveySitesFish.fish_datafile = \
-            super().download_and_extract(EASurveySitesFish.fish_zipfile) \
-                + EASurveySitesFish.fish_filename
+            super().get_datafile(EASurveySitesFish.fish_zipfile, 
+                                 EASurveySitesFish.fish_filename)
        
        
     def process_data(self):
@@ -59,10 +65,10 @@ class EASurveySitesFish(EAEcologyAndFishData):
                             'EVENT_DATE', 
                             'SURVEY_RANKED_EASTING', 
                             'SURVEY_RANKED_NORTHING']
-        dataframe = pandas.read_csv(file, 
-                                    usecols=columns_required, 
-                                    dtype=str, 
-                                    parse_dates=['EVENT_DATE'])
+        dataframe = EAEcologyAndFishData.read_datafile(file, 
+                                                       columns_required, 
+                                                       EASurveySitesFish.csv_dtypes, 
+                                                       EASurveySitesFish.csv_date_columns)
                                     
         # Sort on site_id and last_survey then keep only the first row for each site_id
         dataframe = dataframe.sort_values(['SITE_ID', 'EVENT_DATE'], 
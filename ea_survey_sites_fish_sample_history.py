@@ -22,13 +22,23 @@ class EASurveySitesFishHistory(EAEcologyAndFishData):
     fish_zipfile = "FW_Fish_Counts.zip"
     fish_filename = "FW_Fish_Counts.csv"
     fish_datafile = ""
+    # Types of csv columns read by construct_df(). Other columns are read as str
+    csv_dtypes = {
+        "SITE_ID": "category",
+        "SITE_NAME": "category",
+        "SURVEY_ID": "category",
+        "SURVEY_METHOD": "category",
+        "SURVEY_STRATEGY": "category",
+        "SURVEY_RANKED_EASTING": "float64",
+        "SURVEY_RANKED_NORTHING": "float64",
+    }
+    csv_date_columns = ["EVENT_DATE"]
 
     def get_data(self):
         """Download and extract EA Freshwater fish counts (NFPD) data
         - see superclass for url"""
-        EASurveySitesFishHistory.fish_datafile = (
-            super().download_and_extract(EASurveySitesFishHistory.fish_zipfile)
-            + EASurveySitesFishHistory.fish_filename
+        EASurveySitesFishHistory.fish_datafile = super().get_datafile(
+            EASurveySitesFishHistory.fish_zipfile, EASurveySitesFishHistory.fish_filename
         )
 
     def process_data(self):
@@ -59,8 +69,8 @@ class EASurveySitesFishHistory(EAEcologyAndFishData):
             "SURVEY_RANKED_EASTING",
             "SURVEY_RANKED_NORTHING",
         ]
-        dataframe = pandas.read_csv(
-            file, usecols=columns_required, dtype=str, parse_dates=["EVENT_DATE"]
+        dataframe = EAEcologyAndFishData.read_datafile(
+            file, columns_required, EASurveySitesFishHistory.csv_dtypes, EASurveySitesFishHistory.csv_date_columns
         )
 
         # Sort on site_id and last_survey then keep only the first row for each site_id
@@ -23,6 +23,14 @@ class EASurveySitesFishHistory2(EAEcologyAndFishData):
     fish_zipfile = 'FW_Fish_Counts.zip' 
     fish_filename = 'FW_Fish_Counts.csv'
     fish_datafile = ''
+    # Types of csv columns read by construct_df(). Other columns are read as str
+    csv_dtypes = {'SITE_ID': 'category', 
+                  'SITE_NAME': 'category', 
+                  'SURVEY_RANKED_EASTING': 'float64', 
+                  'SURVEY_RANKED_NORTHING': 'float64'}
+    csv_date_columns = ['EVENT_DATE']
+    aggregate_in_chunks = True # If True, use construct_df_chunked() rather than construct_df()
+    chunk_size = 500000 # Rows of FW_Fish_Counts.csv read at a time by construct_df_chunked()
     
   
     def get_data(self):
@@ -30,14 +38,18 @@ class EASurveySitesFishHistory2(EAEcologyAndFishData):
         ''' Download and extract EA Freshwater fish counts (NFPD) data 
                 - see superclass for url '''
         EASurveySitesFishHistory2.fish_datafile = \
-            super().download_and_extract(EASurveySitesFishHistory2.fish_zipfile) \
-                + EASurveySitesFishHistory2.fish_filename
+            super().get_datafile(EASurveySitesFishHistory2.fish_zipfile, 
+                                 EASurveySitesFishHistory2.fish_filename)
        
        
     def process_data(self):
         
         # Construct dataframe and write result to base class attribute 'dataframe'
-        self.dataframe = self.construct_df(EASurveySitesFishHistory2.fish_datafile)
+        if EASurveySitesFishHistory2.aggregate_in_chunks:
+            self.dataframe = \
+                self.construct_df_chunked(EASurveySitesFishHistory2.fish_datafile)
+        else:
+            self.dataframe = self.construct_df(EASurveySitesFishHistory2.fish_datafile)
                  
         # Convert eastings and northings into lats and longs
         super().easting_northing_to_wgs84()
@@ -59,10 +71,10 @@ class EASurveySitesFishHistory2(EAEcologyAndFishData):
                             'EVENT_DATE', 
                             'SURVEY_RANKED_EASTING', 
                             'SURVEY_RANKED_NORTHING']
-        dataframe = pandas.read_csv(file, 
-                                    usecols=columns_required, 
-                                    dtype=str, 
-                                    parse_dates=['EVENT_DATE'])
+        dataframe = EAEcologyAndFishData.read_datafile(file, 
+                                                       columns_required, 
+                                                       EASurveySitesFishHistory2.csv_dtypes, 
+                                                       EASurveySitesFishHistory2.csv_date_columns)
                                     
         # Sort on site_id and last_survey then keep only the first row for each site_id
         dataframe = dataframe.sort_values(['SITE_ID', 'EVENT_DATE'], 
@@ -75,13 +87,16 @@ class EASurveySitesFishHistory2(EAEcologyAndFishData):
         # Remove timestamps                                  
         dataframe['EVENT_DATE'] = pandas.to_datetime(dataframe['EVENT_DATE']).dt.date
         
-        # Convert dates back to type string
-        dataframe['EVENT_DATE'] = dataframe['EVENT_DATE'].astype(str)        
+        # Convert dates back to type string, leaving missing dates missing rather 
+        #  than 'NaT', as pandas 3 leaves them
+        dataframe['EVENT_DATE'] = \
+            dataframe['EVENT_DATE'].astype(str).where(dataframe['EVENT_DATE'].notna())
         
         # Loop through all sites to get first and last sample for each site. Add to columns, remove all other rows
         # start by creating new columns
         dataframe['recent_sample'] = "x"
-        dataframe['num_samples'] = "x"
+        dataframe['num_samples'] = 0
+        dataframe['first_fish_survey'] = dataframe['EVENT_DATE'] # Same type; set for every site below
         # create a list of unique site ids
         id_list = dataframe['SITE_ID'].to_list()
         id_set = [*set(id_list)]
@@ -120,6 +135,109 @@ class EASurveySitesFishHistory2(EAEcologyAndFishData):
         return dataframe
         
         
+
+    @staticmethod # Since does not access or write to any class attributes      
+    def construct_df_chunked(file):
+        ''' Equivalent to construct_df() but reads the csv file chunk_size rows at a 
+             time, read and typed as construct_df() reads it, folding each chunk into 
+             one reducer per site: [first event date, last event date, row count, 
+             latest name, latest easting, latest northing]. Memory therefore scales 
+             with the number of sites rather than the number of rows.
+            As in construct_df(), the latest row is the first in the file with the 
+             latest event date, and a site with any event date that could not be 
+             parsed has no first event date. '''
+        print(f'\nReading fish sites in chunks from bulk download file:\n{file}\n')
+
+        columns_required = ['SITE_ID', 
+                            'SITE_NAME', 
+                            'EVENT_DATE', 
+                            'SURVEY_RANKED_EASTING', 
+                            'SURVEY_RANKED_NORTHING']
+        sites = {}
+        num_rows = 0
+
+        chunks = EAEcologyAndFishData.read_datafile_chunks(file, 
+                                                           columns_required, 
+                                                           EASurveySitesFishHistory2.chunk_size, 
+                                                           EASurveySitesFishHistory2.csv_dtypes, 
+                                                           EASurveySitesFishHistory2.csv_date_columns)
+        for chunk in chunks:
+            num_rows += len(chunk)
+
+            # Reduce the chunk to one row per site before folding into 'sites'
+            grouped = chunk.groupby('SITE_ID', sort=False, observed=True)['EVENT_DATE']
+            counts = grouped.size()
+            first_dates = grouped.min()
+            undated = chunk['EVENT_DATE'].isna().groupby(chunk['SITE_ID'], observed=True).any()
+            latest = chunk.sort_values('EVENT_DATE', ascending=False, kind='stable') \
+                          .drop_duplicates('SITE_ID', keep='first') \
+                          .set_index('SITE_ID')
+
+            for row in latest.itertuples():
+                site = row.Index
+                first_date = pandas.NaT if undated[site] else first_dates[site]
+                if site not in sites:
+                    sites[site] = [first_date, row.EVENT_DATE, counts[site], row.SITE_NAME, 
+                                   row.SURVEY_RANKED_EASTING, row.SURVEY_RANKED_NORTHING]
+                    continue
+
+                reducer = sites[site]
+                reducer[2] += counts[site]
+                if not pandas.isna(reducer[0]) \
+                    and (pandas.isna(first_date) or first_date < reducer[0]):
+                    reducer[0] = first_date
+                if not pandas.isna(row.EVENT_DATE) \
+                    and (pandas.isna(reducer[1]) or row.EVENT_DATE > reducer[1]):
+                    reducer[1] = row.EVENT_DATE
+                    reducer[3:] = [row.SITE_NAME, 
+                                   row.SURVEY_RANKED_EASTING, 
+                                   row.SURVEY_RANKED_NORTHING]
+            print(f'{num_rows} rows read, {len(sites)} sites found.')
+
+        dataframe = pandas.DataFrame.from_dict(sites, 
+                                               orient='index', 
+                                               columns=['first_fish_survey', 
+                                                        'EVENT_DATE', 
+                                                        'num_samples', 
+                                                        'SITE_NAME', 
+                                                        'SURVEY_RANKED_EASTING', 
+                                                        'SURVEY_RANKED_NORTHING'])
+        dataframe.index.name = 'SITE_ID'
+        dataframe = dataframe.sort_index().reset_index()
+        dataframe = EAEcologyAndFishData.type_columns(dataframe, 
+                                                      EASurveySitesFishHistory2.csv_dtypes, 
+                                                      EASurveySitesFishHistory2.csv_date_columns)
+
+        # Remove timestamps and convert dates back to type string, as construct_df() does
+        for column in ['first_fish_survey', 'EVENT_DATE']:
+            dates = pandas.to_datetime(dataframe[column]).dt.date
+            dataframe[column] = dates.astype(str).where(dates.notna())
+
+        # Rename and reorder columns
+        renaming = {'SITE_ID': 'fish_site_id', 
+                    'SITE_NAME': 'fish_site_name', 
+                    'EVENT_DATE': 'last_fish_survey', 
+                    'SURVEY_RANKED_EASTING': 'easting', 
+                    'SURVEY_RANKED_NORTHING': 'northing'}
+        dataframe = dataframe.rename(columns=renaming, errors='raise')
+        reordering = ['fish_site_id', 
+                      'fish_site_name', 
+                      'easting', 
+                      'northing', 
+                      'num_samples',
+                      'first_fish_survey',
+                      'last_fish_survey']
+        dataframe = dataframe.reindex(columns=reordering)
+        
+        # Drop any rows that lack easting/northing data
+        dataframe = dataframe.dropna(subset=['easting', 'northing'], axis=0)
+        num_geotagged_rows = format(len(dataframe))
+        print(f'We have {num_geotagged_rows} geotagged rows.\n')
+        dataframe = dataframe.reset_index(drop=True)
+        
+        return dataframe
+
+
     def append_placeholder(self):
         ''' Append a 'placeholder' row on to the top of the fish dataframe to ensure 
              AGOL infers correct field type for 'year' (we want string). This will be 
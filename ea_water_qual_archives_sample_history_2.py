@@ -13,19 +13,30 @@ from shapely import wkt
 
 # Local application imports
 from geo_data import GeoData
+from ea_water_qual_sample_data import EAWaterQualSampleData
 
 
 ''' 
-A derived class that inherits from the base class GeoData
+A derived class that inherits from EAWaterQualSampleData, which inherits 
+from the base class GeoData
 NB __init__ is not defined so the base class __init__ is inherited and 
 used to construct a class object
 '''
 
-class EAWaterQualSampleArchives2(GeoData):
+class EAWaterQualSampleArchives2(EAWaterQualSampleData):
    
     # Define class attributes:
     url_records =  'https://environment.data.gov.uk/water-quality/id/sampling-point'
     occurrences_list_of_dicts = []
+    # Fields of each item kept as the response streams in - those used by construct_df()
+    items_fields = ['notation',
+                    'samplingPointStatus',
+                    'samplingPointType',
+                    'lat',
+                    'long']
+    # Statistics of each sampling point's samples, see build_site_dataframe()
+    site_stats_columns = ['purpose']
+    year_counts = 'rows'
     '''
     Get 1st 10000 sampling points
     https://environment.data.gov.uk/water-quality/id/sampling-point?_limit=10000
@@ -35,63 +46,19 @@ class EAWaterQualSampleArchives2(GeoData):
                 
     def get_data(self): # Using Water Quality Archive API  
     
-        '''
-        TRIED GETTING DATA IN A 'ONER', AND '10000 AT A TIME'. BOTH RETURN 61228 SAMPLING POINTS DESPITE 
-        DISCREPENCY BETWEEN NUMBER OF ITEMS REQUESTED AND NUMBER RETURNED IN '10000 AT A TIME' METHOD.
-        16/06/2022
-        '''
-        # Get data, in one go (assuming not more than 100000 items)
-        url = EAWaterQualSampleArchives2.url_records + '?_limit=100000' # Get 100000 sampling points
+        # Get data, items_page_size items at a time, several pages at once
+        url = self.filtered_url(EAWaterQualSampleArchives2.url_records)
         print(f'\nGetting {self.dataobject} data ' \
               f'from EA Water Quality Archive API:\n{url}\n')
-        occurrences_response = requests.get(f'{url}')
-
-        num_observations = len(json.loads(occurrences_response.text)['items'])
-
         EAWaterQualSampleArchives2.occurrences_list_of_dicts = \
-            json.loads(occurrences_response.text)['items'] 
- 
-        num_downloaded = len(json.loads(occurrences_response.text)['items']) 
-        total_num_downloaded = num_downloaded
-        print(f'Total number of items downloaded: {total_num_downloaded}')
+            GeoData.get_all_items(url, EAWaterQualSampleArchives2.items_fields)
 
-        '''
-        # Get data, num_returned_max at a time
-        num_returned_max = 10000
-        page_size = num_returned_max
-        start_index = 0
-        total_num_downloaded = 0
-        done = False
-        
-        while not done:
-        
-            url = \
-                EAWaterQualSampleArchives2.url_records \
-                    + '?_limit=' \
-                    + str(num_returned_max) \
-                    + '&_offset=' \
-                    + str(start_index)
+        total_num_downloaded = len(EAWaterQualSampleArchives2.occurrences_list_of_dicts)
 
-            print(f'\nGetting {self.dataobject} data ' \
-                  f'from EA Water Quality Archive API:\n{url}\n')
-            occurrences_response = requests.get(f'{url}')
-            
-            #print(f"json.loads(occurrences_response.text)['items']: {json.loads(occurrences_response.text)['items']}")
-            
-            # Join any downloaded occurrences to EAWaterQualSampleArchives2.occurrences_list_of_dicts
-            EAWaterQualSampleArchives2.occurrences_list_of_dicts = \
-                EAWaterQualSampleArchives2.occurrences_list_of_dicts \
-                    + json.loads(occurrences_response.text)['items'] 
-                                      
-            num_downloaded = len(json.loads(occurrences_response.text)['items']) 
-            total_num_downloaded += num_downloaded
-            print(f'Number of items downloaded: {num_downloaded}')
-            print(f'Total number of items downloaded: {total_num_downloaded}')
-                       
-            start_index += num_returned_max
-            if num_downloaded == 0:
-                done = True
-        '''
+        if EAWaterQualSampleArchives2.use_bulk_archives:
+            self.site_stats = self.get_bulk_site_stats()
+        elif EAWaterQualSampleArchives2.use_refresh_schedule:
+            self.site_stats = self.get_scheduled_site_stats(EAWaterQualSampleArchives2.occurrences_list_of_dicts)
         
         if (total_num_downloaded == 0):
             print(f'No data found.')        
@@ -101,10 +68,8 @@ class EAWaterQualSampleArchives2(GeoData):
 
 
     def process_data(self):
-        # Construct dataframe and write result to base class attribute 'dataframe'
-        self.dataframe = \
-            self.construct_df(EAWaterQualSampleArchives2.occurrences_list_of_dicts)
-         
+        self.prepare_data()
+
         # Calculate square occurrence regions to display on map
         #self.dataframe = \
         #    self.calculate_osgb_polygon(self.dataframe)
@@ -117,8 +82,15 @@ class EAWaterQualSampleArchives2(GeoData):
         #self.append_placeholder()
        
        
+    def prepare_data(self):
+        # Construct dataframe and write result to base class attribute 'dataframe'
+        #  NB this is all a shard does before save_partial()
+        self.dataframe = \
+            self.construct_df(EAWaterQualSampleArchives2.occurrences_list_of_dicts, self.site_stats)
+
+
     @staticmethod # Since does not access or write to any class attributes  
-    def construct_df(dicts): 
+    def construct_df(dicts, site_stats=None): 
 #        # Flatten data
 #        dataframe = pandas.json_normalize(dict, record_path=['occurrences'])
         dataframe_site = pandas.DataFrame(dicts)
@@ -204,84 +176,24 @@ class EAWaterQualSampleArchives2(GeoData):
             else:
                 print(f'Sampling point type group code unrecognised: {to_match}')
 
-        # define base url for getting list of samples
-        base_url_samples = 'https://environment.data.gov.uk/water-quality/data/sample.json?'
-
-        total_samples = 0
-
-        # create empty dataframe
-        dataframe = pandas.DataFrame()
-
         # get site data as dictionary
         notation_list = [x for x in dataframe_site['notation']]
         type_list = [x for x in dataframe_site['samplingPointType_group']]
         status_list = [x for x in dataframe_site['samplingPointStatus']]
         lat_list = [x for x in dataframe_site['lat']]
         long_list = [x for x in dataframe_site['long']]
-        site_list_dict = []
-        for index in range(len(notation_list)) :
-            site_dict = {'notation': notation_list[index], 'lat': lat_list[index], 'long': long_list[index]}
-            site_list_dict.append(site_dict)
-
-        # loop through every site to get all samples from each site
-        # for i in range(len(site_list_dict)) :
-        for i in range(50) :
-            url_samples = base_url_samples + "samplingPoint=" + site_list_dict[i]['notation'] + "&_limit=10000"
-            samples_response = requests.get(f'{url_samples}')
-
-            EAWaterQualSampleArchives2.samples_list_of_dicts = \
-                json.loads(samples_response.text)['items']
-
-            dataframe_sample = pandas.DataFrame(EAWaterQualSampleArchives2.samples_list_of_dicts)
-            
-            columns_required = ['purpose',
-                                'sampleDateTime']
-            dataframe_sample = dataframe_sample[columns_required]
-
-            # edit purpose
-            for row in dataframe_sample.itertuples() :
-                dataframe_sample.at[row.Index, 'purpose'] = dataframe_sample.at[row.Index, 'purpose']['label']
-
-            # number of samples at the site
-            num_samples = len(dataframe_sample)
-            total_samples += num_samples
-
-            # create column for year
-            dataframe_sample['year'] = [y[:4] for y in dataframe_sample['sampleDateTime']]
-            sample_year_list = dataframe_sample['year'].to_list()
-
-            # compress dataframe so each row is a year of samples at one site
-            annual_list = [str(y) for y in range(2000,2024)]
-            annual_dict = {}
-            for y in annual_list:
-                if y in sample_year_list:
-                    annual_dict[y] = sample_year_list.count(str(y))
-                else :
-                    annual_dict[y] = 0
-
-            # create link to site samples
-            site_url = "http://environment.data.gov.uk/water-quality/view/sampling-point/" + notation_list[i] + ".html"
-
-            # create row for site metadata
-            for year in range(len(list(annual_dict.keys()))):
-
-                new_row = {}
-                new_row['notation'] = notation_list[i]
-                new_row['site_url'] = site_url
-                new_row['sample_type'] = type_list[i]
-                new_row['status'] = status_list[i]
-                new_row['lat'] = lat_list[i]
-                new_row['long'] = long_list[i]
-                new_row['purpose'] = dataframe_sample['purpose'][0]
-                new_row['year'] = list(annual_dict.keys())[year]
-                new_row['annual_sample_count'] = list(annual_dict.values())[year]
-                new_row_series = pandas.Series(new_row)
-                # append row to dataframe
-                dataframe = pandas.concat([dataframe, new_row_series.to_frame().T], ignore_index=True)
-
-        dataframe = dataframe.fillna('')
-        total_num_sites = format(len(dataframe))
-        print(f'\nWe have {total_num_sites} sites, totalling {total_samples}.\n')
+        sites = pandas.DataFrame({'notation': notation_list,
+                                  'site_url': ["http://environment.data.gov.uk/water-quality/view/sampling-point/" + notation + ".html"
+                                               for notation in notation_list],
+                                  'sample_type': type_list,
+                                  'status': status_list,
+                                  'lat': lat_list,
+                                  'long': long_list})
+
+        # add the statistics of each site's samples
+        dataframe = EAWaterQualSampleData.build_site_dataframe(sites, site_stats,
+                                                               EAWaterQualSampleArchives2.site_stats_columns,
+                                                               EAWaterQualSampleArchives2.year_counts)
 
         return dataframe
         
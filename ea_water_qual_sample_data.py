@@ -0,0 +1,579 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import concurrent.futures
+import datetime
+import json
+import os
+import re
+import time
+import zipfile
+import zlib
+
+# Related third party imports
+import numpy
+import pandas
+
+# Local application imports
+from geo_data import GeoData
+
+
+'''
+A derived class that inherits from the base class GeoData, and from which the
+ EA Water Quality Archive sample history classes inherit
+NB __init__ is not defined so the base class __init__ is inherited and
+used to construct a class object
+'''
+
+
+class EAWaterQualSampleData(GeoData):
+
+    # Define class attributes:
+    samples_url = 'https://environment.data.gov.uk/water-quality/data/sample.json?'
+    samples_limit = 10000 # Most samples returned for one sampling point
+    max_samples_in_flight = 200 # sample.json requests made at once by get_site_samples()
+    progress_interval = 1000 # Sampling points between progress reports
+    sites_filter = '' # Query restricting the sampling points got, e.g. 'area=3-34'; set per shard
+    shards_dirname = 'shards' # In the working directory; see shard_feature_service.py
+    # Alternatively, count samples from the bulk archives of each year's measurements
+    use_bulk_archives = False # Set to True to use get_bulk_site_stats() rather than get_site_samples()
+    use_archive_cache = True # Bulk archives of past years rarely change
+    bulk_url = 'https://environment.data.gov.uk/water-quality/batch/measurement?'
+    bulk_first_year = 2000 # The archive starts in 2000
+    bulk_download_workers = 4 # Yearly archives downloaded and read at once
+    bulk_chunk_size = 1000000 # Rows of an archive read at a time
+    # Columns of an archive (one row per measurement) needed, and what they are called here
+    bulk_columns = {'@id': 'measurement', # <sample @id>-<number>, e.g. .../measurement/NE-1960008-0085
+                    'sample.samplingPoint.notation': 'notation',
+                    'sample.sampleDateTime': 'sampleDateTime',
+                    'sample.purpose.label': 'purpose'}
+    # Otherwise, only get samples at the sampling points due a refresh, keeping the 
+    #  statistics of the rest from earlier runs
+    use_refresh_schedule = True
+    history_filename = 'water_qual_site_history.json' # In the working directory
+    active_days = 365 # Open sites sampled within this many days are refreshed every run
+    dormant_refresh_days = 30 # Other open sites are refreshed at least this often...
+    closed_refresh_days = 180 # ...and closed ones this often
+    site_stats = None # Set in get_data() if use_bulk_archives or use_refresh_schedule
+    # Statistics of each sampling point's samples in the layer, see build_site_dataframe()
+    site_stats_columns = ['purpose', 'num_samples'] # Of purpose, num_samples, first_sample, recent_sample
+    year_counts = 'columns' # 'columns', or 'rows' for a row for each year at each site, or None
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def get_site_samples(notations, site_row, failed=None):
+        ''' Get the samples at each sampling point in <notations> and reduce them, in
+             turn, to that point's row(s) by calling site_row(index, samples).
+             Up to max_samples_in_flight sampling points are got at once, each on a 
+             thread of its own using the shared HTTPClient, but site_row() is called 
+             on this thread, as pandas runs slower on many threads at once. Memory 
+             holds the samples of the sites got but not yet reduced, rather than 
+             every site's.
+            Returns the results of site_row() in the same order as <notations>, with
+             None for a sampling point that has no samples or could not be got; those
+             that could not be got are also appended to the list <failed>, if given. '''
+        print(f'\nGetting samples at {len(notations)} sampling points, ' \
+              f'{EAWaterQualSampleData.max_samples_in_flight} at a time...')
+
+        def fetch(index):
+            # Returns (samples, None), or (None, error) if they could not be got
+            url_samples = EAWaterQualSampleData.samples_url \
+                + 'samplingPoint=' + notations[index] \
+                + '&_limit=' + str(EAWaterQualSampleData.samples_limit)
+            try:
+                samples = GeoData.http_get_json(url_samples)
+            except Exception as error:
+                return (None, error)
+            return (samples['items'], None)
+
+        results = []
+        no_samples = []
+        failures = []
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=EAWaterQualSampleData.max_samples_in_flight) as executor:
+            for (index, (samples, error)) in enumerate(executor.map(fetch, range(len(notations)))):
+                result = None
+                if error is not None:
+                    failures.append((notations[index], error))
+                elif not samples:
+                    no_samples.append(notations[index])
+                else:
+                    result = site_row(index, samples)
+                results.append(result)
+                if (index + 1) % EAWaterQualSampleData.progress_interval == 0:
+                    print(f'Got samples at {index + 1} of {len(notations)} sampling points')
+
+        if no_samples:
+            print(f'\n{len(no_samples)} sampling points have no samples and are left out.')
+        if failures:
+            for (notation, error) in failures:
+                print(f'\nFailed to get samples at {notation}: {error!r}')
+            print(f'\n{len(failures)} sampling points could not be got and are left out.')
+            if failed is not None:
+                failed.extend(notation for (notation, _) in failures)
+
+        return results
+
+
+    def get_bulk_site_stats(self):
+        ''' Count the samples at every sampling point (in sites_filter, if set) from the 
+             bulk archives of each year's measurements, a handful of downloads, rather 
+             than from one sample.json request per sampling point.
+            Returns a dataframe indexed by notation with the columns purpose (that of 
+             the first sample in the archives, which may not be the first the API 
+             returns), num_samples, first_sample, recent_sample and one 
+             column of sample counts for each year that has samples. Sampling points 
+             with no samples are not in it. '''
+        years = range(EAWaterQualSampleData.bulk_first_year, time.localtime().tm_year + 1)
+        print(f'\nGetting samples from the bulk archives for {years[0]} to {years[-1]}...')
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=EAWaterQualSampleData.bulk_download_workers) as executor:
+            samples = list(executor.map(
+                self.get_bulk_samples, years))
+
+        return EAWaterQualSampleData.summarise_samples(pandas.concat(samples, ignore_index=True))
+
+
+    def get_bulk_samples(self, year):
+        # Download the archive of <year>'s measurements and reduce it to one row per sample
+        file = (f'{self.sites_filter}&' if self.sites_filter else '') + f'year={year}'
+        archive = self.download_archive(EAWaterQualSampleData.bulk_url, file)
+
+        # Read a chunk at a time, keeping only one row per sample from each
+        columns = EAWaterQualSampleData.bulk_columns
+        chunks = pandas.read_csv(archive,
+                                 usecols=list(columns),
+                                 dtype=str,
+                                 compression='zip' if zipfile.is_zipfile(archive) else None,
+                                 chunksize=EAWaterQualSampleData.bulk_chunk_size)
+        samples = [EAWaterQualSampleData.measurements_to_samples(chunk.rename(columns=columns))
+                   for chunk in chunks]
+        if not samples:
+            return pandas.DataFrame(columns=['sample', 'notation', 'sampleDateTime', 'purpose'])
+        samples = pandas.concat(samples, ignore_index=True)
+        samples = samples.drop_duplicates('sample', ignore_index=True)
+
+        print(f'{year}: {len(samples)} samples')
+        return samples
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def measurements_to_samples(measurements):
+        # One row per sample, identified by its measurements' @id less the last part
+        measurements['sample'] = measurements['measurement'].str.rsplit('-', n=1).str[0]
+        samples = measurements.drop_duplicates('sample')
+        return samples[['sample', 'notation', 'sampleDateTime', 'purpose']]
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def summarise_samples(samples):
+        ''' Reduce <samples>, one row per sample, to the statistics of each sampling 
+             point. Its purpose is that of its first sample in the order given, as the 
+             per-site API path takes it from the first sample the API returns. As 
+             that path does, every sample is counted in num_samples, but only those 
+             with a sampleDateTime in first_sample, recent_sample and the years. '''
+        samples = samples.dropna(subset=['notation'])
+        purposes = samples.drop_duplicates('notation').set_index('notation')['purpose']
+        num_samples = samples.groupby('notation').size()
+
+        dated = samples.dropna(subset=['sampleDateTime'])
+        dated = dated.sort_values(['notation', 'sampleDateTime'], ignore_index=True)
+        sites = dated.groupby('notation', sort=False)
+        site_stats = pandas.DataFrame({'purpose': purposes,
+                                       'num_samples': num_samples,
+                                       'first_sample': sites['sampleDateTime'].first(),
+                                       'recent_sample': sites['sampleDateTime'].last()},
+                                      index=num_samples.index)
+
+        years = dated['sampleDateTime'].str[:4]
+        dated = dated[years.str.isdigit()]
+        year_counts = pandas.crosstab(dated['notation'], years[dated.index])
+        return site_stats.join(year_counts.reindex(num_samples.index, fill_value=0))
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def sample_years(sample_date_times):
+        # The years, as integers, of the series <sample_date_times>, leaving out any missing
+        years = pandas.to_numeric(sample_date_times.str[:4], errors='coerce')
+        return years.dropna().to_numpy(dtype=int)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def count_years(site_years):
+        ''' Count the samples in each year at every site at once, where <site_years> 
+             holds an array of sample years, from sample_years(), for each site. 
+             Returns a dataframe with a row for each site and a column for each year, 
+             from the earliest sample at any site to the latest. '''
+        num_sites = len(site_years)
+        years = numpy.concatenate(site_years) if num_sites else numpy.zeros(0, dtype=int)
+        if len(years) == 0:
+            return pandas.DataFrame(index=range(num_sites))
+
+        first_year = int(years.min())
+        num_years = int(years.max()) - first_year + 1
+        # Histogram of (site, year) pairs, each numbered site * num_years + year offset
+        sites = numpy.repeat(numpy.arange(num_sites), [len(y) for y in site_years])
+        counts = numpy.bincount(sites * num_years + (years - first_year),
+                                minlength=num_sites * num_years)
+        return pandas.DataFrame(counts.reshape(num_sites, num_years),
+                                columns=[str(year) for year in range(first_year, first_year + num_years)])
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def year_columns(columns):
+        # Every year, as a string, from the earliest to the latest of the year <columns>
+        years = [int(column) for column in columns if str(column).isdigit()]
+        return [str(year) for year in range(min(years), max(years) + 1)] if years else []
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def years_to_rows(dataframe, year_columns):
+        # Melt <dataframe>, one row per site, to one row for each of <year_columns> at each site
+        id_columns = [column for column in dataframe.columns if column not in year_columns]
+        dataframe = dataframe.melt(id_vars=id_columns,
+                                   value_vars=year_columns,
+                                   var_name='year',
+                                   value_name='annual_sample_count',
+                                   ignore_index=False)
+        return dataframe.sort_index(kind='stable').reset_index(drop=True)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def join_site_stats(sites, site_stats):
+        ''' Join <site_stats>, from get_bulk_site_stats(), to the dataframe <sites>, 
+             one row per sampling point, leaving out sampling points with no samples 
+             as get_site_samples() does. '''
+        dataframe = sites.join(site_stats, on='notation', how='inner')
+        return dataframe.reset_index(drop=True)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def build_site_dataframe(sites, site_stats, stats_columns, year_counts):
+        ''' Add to <sites>, a dataframe with a row for each sampling point, the 
+             <stats_columns> of the statistics of its samples and, if <year_counts> is 
+             'columns', a column of sample counts for each year or, if it is 'rows', a 
+             row for each year at each sampling point. The statistics are joined from 
+             <site_stats>, from the bulk archives or site history, if given, or else 
+             worked out from the samples at every sampling point, got by 
+             get_site_samples(). Sampling points with no samples are left out. '''
+        if site_stats is not None:
+            # Join every site's statistics, from the bulk archives or site history, in one go
+            dataframe = EAWaterQualSampleData.join_site_stats(sites, site_stats)
+            total_samples = dataframe['num_samples'].sum()
+            year_columns = EAWaterQualSampleData.year_columns(site_stats.columns) if year_counts else []
+            dataframe = dataframe.reindex(columns=list(sites.columns) + stats_columns + year_columns,
+                                          fill_value=0)
+
+        else:
+            notation_list = [x for x in sites['notation']]
+
+            # reduce the samples at site i, as they arrive, to its statistics
+            def site_row(i, samples_list_of_dicts):
+                dataframe_sample = pandas.DataFrame(samples_list_of_dicts)
+
+                # number of samples at the site
+                new_row = {'num_samples': len(dataframe_sample)}
+                if 'purpose' in stats_columns:
+                    new_row['purpose'] = dataframe_sample['purpose'][0]['label']
+                if 'first_sample' in stats_columns or 'recent_sample' in stats_columns:
+                    # of those samples that have a date
+                    DateTime_list = sorted(dataframe_sample['sampleDateTime'].dropna().to_list())
+                    new_row['first_sample'] = DateTime_list[0] if DateTime_list else None
+                    new_row['recent_sample'] = DateTime_list[-1] if DateTime_list else None
+
+                # years of the samples, counted at every site at once when all have arrived
+                sample_years = None
+                if year_counts:
+                    sample_years = EAWaterQualSampleData.sample_years(dataframe_sample['sampleDateTime'])
+                return (i, new_row, sample_years)
+
+            # get all samples from every site, max_samples_in_flight sites at a time
+            site_results = EAWaterQualSampleData.get_site_samples(notation_list, site_row)
+
+            # collect the rows as records, and build the dataframe from them once
+            site_indices = []
+            rows = []
+            site_years = []
+            for result in site_results:
+                if result is None: # No samples, or could not be got
+                    continue
+                (i, new_row, sample_years) = result
+                site_indices.append(i)
+                rows.append(new_row)
+                site_years.append(sample_years)
+            stats = pandas.DataFrame.from_records(rows, columns=list(dict.fromkeys(['num_samples'] + stats_columns)))
+            total_samples = stats['num_samples'].sum()
+            dataframe = sites.iloc[site_indices].reset_index(drop=True).join(stats[stats_columns])
+            year_columns = []
+            if year_counts:
+                year_counts_by_site = EAWaterQualSampleData.count_years(site_years)
+                year_columns = list(year_counts_by_site.columns)
+                dataframe = dataframe.join(year_counts_by_site)
+
+        if year_counts == 'rows':
+            # one row for each year of samples at each site
+            dataframe = EAWaterQualSampleData.years_to_rows(dataframe, year_columns)
+
+        dataframe = dataframe.fillna('')
+        total_num_sites = format(len(dataframe))
+        print(f'\nWe have {total_num_sites} sites, totalling {total_samples}.\n')
+
+        return dataframe
+
+
+    def get_scheduled_site_stats(self, sites_list_of_dicts):
+        ''' Get the samples at those of the sampling points in <sites_list_of_dicts> (as 
+             got from the sampling-point API) that are due a refresh, and return the 
+             statistics of every one that has samples, as get_bulk_site_stats() does. 
+             Each sampling point's statistics are kept in the site history between runs,
+             so that those unlikely to have new samples needn't be got every run; see 
+             is_due(). '''
+        history = self.load_site_history()
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        statuses = {}
+        for site in sites_list_of_dicts:
+            if site.get('notation'):
+                status = site.get('samplingPointStatus')
+                statuses[site['notation']] = status.get('label', '') if isinstance(status, dict) else ''
+        due = [notation for (notation, status) in statuses.items()
+               if EAWaterQualSampleData.is_due(notation, status, history.get(notation), now)]
+        print(f'\n{len(due)} of {len(statuses)} sampling points are due a refresh; ' \
+              f'statistics of the other {len(statuses) - len(due)} are from earlier runs.')
+
+        # Reduce each sampling point's samples, as they arrive, to just what's needed
+        def site_samples(i, samples_list_of_dicts):
+            return [(due[i], sample.get('sampleDateTime'), (sample.get('purpose') or {}).get('label'))
+                    for sample in samples_list_of_dicts]
+
+        failed = []
+        site_results = EAWaterQualSampleData.get_site_samples(due, site_samples, failed)
+        samples = pandas.DataFrame([sample for result in site_results if result for sample in result],
+                                   columns=['notation', 'sampleDateTime', 'purpose'])
+        fresh_stats = EAWaterQualSampleData.summarise_samples(samples)
+
+        # Sampling points that could not be got keep their statistics from earlier runs
+        checked = now.isoformat()
+        failed = set(failed)
+        for notation in due:
+            if notation in failed:
+                continue
+            entry = {'checked': checked, 'status': statuses[notation], 'num_samples': 0}
+            if notation in fresh_stats.index:
+                stats = fresh_stats.loc[notation]
+                entry.update({'purpose': stats['purpose'],
+                              'num_samples': int(stats['num_samples']),
+                              'first_sample': stats['first_sample'],
+                              'recent_sample': stats['recent_sample'],
+                              'years': {year: int(stats[year]) for year in fresh_stats.columns[4:]
+                                        if stats[year] > 0}})
+            history[notation] = entry
+        self.save_site_history(history)
+
+        return EAWaterQualSampleData.history_to_site_stats(history, list(statuses))
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def is_due(notation, status, entry, now):
+        ''' True if the sampling point <notation>, whose site history is <entry>, should
+             have its samples got again: if it has no history or its status has changed;
+             every run if it is open and was sampled within active_days; otherwise once
+             its history is older than dormant_refresh_days (or, if sooner, its mean 
+             interval between samples), or closed_refresh_days if it is closed. Refreshes
+             are staggered, by notation, so that sites checked on the same run don't
+             all come due on the same run again. '''
+        if entry is None or entry.get('status') != status:
+            return True
+
+        today = now.date()
+        if status.lower() == 'closed':
+            refresh_days = EAWaterQualSampleData.closed_refresh_days
+        else:
+            refresh_days = EAWaterQualSampleData.dormant_refresh_days
+            if entry['num_samples'] > 0:
+                recent = datetime.date.fromisoformat(entry['recent_sample'][:10])
+                if (today - recent).days <= EAWaterQualSampleData.active_days:
+                    return True
+            if entry['num_samples'] > 1:
+                first = datetime.date.fromisoformat(entry['first_sample'][:10])
+                mean_interval = (recent - first).days / (entry['num_samples'] - 1)
+                refresh_days = min(refresh_days, max(mean_interval, 1))
+
+        stagger = 0.5 + (zlib.crc32(notation.encode()) % 1000) / 2000 # 0.5 to 1
+        age = now - datetime.datetime.fromisoformat(entry['checked'])
+        return age.total_seconds() / 86400 >= refresh_days * stagger
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def history_to_site_stats(history, notations):
+        # The statistics, as summarise_samples() returns, of those of <notations> with samples
+        rows = []
+        for notation in notations:
+            entry = history.get(notation)
+            if entry is None or entry['num_samples'] == 0:
+                continue
+            row = {'notation': notation,
+                   'purpose': entry['purpose'],
+                   'num_samples': entry['num_samples'],
+                   'first_sample': entry['first_sample'],
+                   'recent_sample': entry['recent_sample']}
+            row.update(entry['years'])
+            rows.append(row)
+
+        stats_columns = ['purpose', 'num_samples', 'first_sample', 'recent_sample']
+        site_stats = pandas.DataFrame(rows)
+        year_columns = sorted(set(site_stats.columns) - set(stats_columns) - {'notation'})
+        site_stats = site_stats.reindex(columns=['notation'] + stats_columns + year_columns)
+        site_stats[year_columns] = site_stats[year_columns].fillna(0).astype(int)
+        return site_stats.set_index('notation')
+
+
+    def site_history_file(self):
+        # A history for each sites_filter, so that shards run at once don't share one
+        (name, extension) = os.path.splitext(EAWaterQualSampleData.history_filename)
+        if self.sites_filter:
+            name += '_' + self.filter_slug()
+        return os.path.join(self.user.working_dir, name + extension)
+
+
+    def load_site_history(self):
+        # The statistics of each sampling point when last got, by notation
+        history_file = self.site_history_file()
+        if not os.path.isfile(history_file):
+            print(f'\nNo site history found. Getting samples at every sampling point.')
+            return {}
+        with open(history_file, 'r') as input_file:
+            return json.load(input_file)
+
+
+    def save_site_history(self, history):
+        history_file = self.site_history_file()
+        temp_file = history_file + '.tmp'
+        with open(temp_file, 'w') as output_file:
+            json.dump(history, output_file)
+        os.replace(temp_file, history_file)
+        print(f'\nSaved site history of {len(history)} sampling points to:\n{history_file}')
+
+
+    def filtered_url(self, url):
+        # <url> restricted to the sampling points in sites_filter, if set
+        return url + '?' + self.sites_filter if self.sites_filter else url
+
+
+    def filter_slug(self):
+        # sites_filter made safe for a file name, e.g. 'area_3-34'
+        return re.sub(r'[^\w-]+', '_', self.sites_filter)
+
+
+    def shards_dir(self):
+        return os.path.join(self.user.working_dir, EAWaterQualSampleData.shards_dirname, self.name)
+
+
+    def plan_shards(self, by='area'):
+        ''' Split the sampling points (in sites_filter, if set) into one shard for each 
+             EA area, or subArea if <by> is 'subArea', and save the plan for 
+             load_partials(). Each shard is a sites_filter, e.g. 'area=3-34', that 
+             can be run on its own, on any machine, by save_partial(). 
+            Stops if any sampling point has no <by>, since no shard would get it. '''
+        sites = GeoData.get_all_items(self.filtered_url(self.url_records), ['notation', by])
+
+        counts = {}
+        unassigned = []
+        for site in sites:
+            value = site.get(by)
+            key = value.get('@id', '').rsplit('/', 1)[-1] if isinstance(value, dict) else ''
+            if key:
+                counts[key] = counts.get(key, 0) + 1
+            else:
+                unassigned.append(site.get('notation'))
+        if unassigned:
+            print(f'\n{len(unassigned)} of {len(sites)} sampling points have no {by}, so would ' \
+                  f'be in no shard and left out of the merge, e.g.:\n{unassigned[:10]}')
+            print('Shard by the other of area and subArea, or run without shards.')
+            raise SystemExit()
+        shards = {f'{by}={key}': count for (key, count) in sorted(counts.items())}
+
+        plan = {'planned': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'sites': len(sites),
+                'shards': shards}
+        os.makedirs(self.shards_dir(), exist_ok=True)
+        with open(os.path.join(self.shards_dir(), 'plan.json'), 'w') as output_file:
+            json.dump(plan, output_file, indent=1)
+
+        print(f'\n{len(shards)} shards of {self.name}:')
+        for (shard, count) in shards.items():
+            print(f'{shard}: {count} sampling points')
+        return list(shards)
+
+
+    def save_partial(self):
+        # Save self.dataframe, before the CaBA join, as the partial result of this shard
+        partial = {'shard': self.sites_filter,
+                   'saved': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                   'sites': len(self.occurrences_list_of_dicts)}
+        partial.update(json.loads(self.dataframe.to_json(orient='split', index=False)))
+
+        partial_file = os.path.join(self.shards_dir(), self.filter_slug() + '.json')
+        os.makedirs(self.shards_dir(), exist_ok=True)
+        temp_file = partial_file + '.tmp'
+        with open(temp_file, 'w') as output_file:
+            json.dump(partial, output_file)
+        os.replace(temp_file, partial_file)
+        print(f'\nSaved {len(self.dataframe)} rows of shard {self.sites_filter} to:\n{partial_file}')
+
+
+    def load_partials(self):
+        ''' Combine the partial results of the shards in shards_dir() into 
+             self.dataframe. If there is a plan, every shard in it must have a partial 
+             result saved since it was made, and between them the shards must have 
+             got as many sampling points as were planned. Sampling points in more 
+             than one shard are only kept once. '''
+        partials = {}
+        for filename in sorted(os.listdir(self.shards_dir())):
+            if filename.endswith('.json') and filename != 'plan.json':
+                with open(os.path.join(self.shards_dir(), filename), 'r') as input_file:
+                    partial = json.load(input_file)
+                partials[partial['shard']] = partial
+
+        plan_file = os.path.join(self.shards_dir(), 'plan.json')
+        if os.path.isfile(plan_file):
+            with open(plan_file, 'r') as input_file:
+                plan = json.load(input_file)
+            missing = [shard for shard in plan['shards'] 
+                       if shard not in partials or partials[shard]['saved'] < plan['planned']]
+            if missing:
+                print(f'\nNo partial result since the shards were planned for:\n{missing}')
+                raise SystemExit()
+            partials = {shard: partials[shard] for shard in plan['shards']}
+            num_sites = sum(partial['sites'] for partial in partials.values())
+            if num_sites != plan['sites']:
+                print(f'\n{plan["sites"]} sampling points were planned, but the shards ' \
+                      f'got {num_sites}. Plan and run the shards again.')
+                raise SystemExit()
+
+        if not partials:
+            print(f'\nNo partial results found in:\n{self.shards_dir()}')
+            raise SystemExit()
+
+        dataframe = pandas.concat([pandas.DataFrame(partial['data'], columns=partial['columns'])
+                                   for partial in partials.values()], ignore_index=True)
+        # Shards may span different years: give every site the full span, with no samples
+        # in the years it hasn't any
+        if 'annual_sample_count' in dataframe.columns:
+            columns = list(dataframe.columns)
+            sites = dataframe.drop(columns=['year', 'annual_sample_count']).drop_duplicates('notation')
+            years = EAWaterQualSampleData.year_columns(dataframe['year'].unique())
+            counts = dataframe.drop_duplicates(['notation', 'year']).set_index(['notation', 'year'])
+            counts = counts['annual_sample_count'].reindex(
+                pandas.MultiIndex.from_product([sites['notation'], years], names=['notation', 'year']),
+                fill_value=0)
+            dataframe = sites.merge(counts.reset_index(), on='notation')[columns]
+        elif EAWaterQualSampleData.year_columns(dataframe.columns):
+            year_columns = EAWaterQualSampleData.year_columns(dataframe.columns)
+            other_columns = [column for column in dataframe.columns if not str(column).isdigit()]
+            at = [str(column).isdigit() for column in dataframe.columns].index(True)
+            dataframe = dataframe.reindex(columns=other_columns[:at] + year_columns + other_columns[at:])
+            dataframe[year_columns] = dataframe[year_columns].fillna(0).astype(int)
+        key = [column for column in ('notation', 'year') if column in dataframe.columns]
+        dataframe = dataframe.drop_duplicates(subset=key)
+        self.dataframe = dataframe.sort_values(key, kind='stable', ignore_index=True)
+        print(f'\nMerged {len(partials)} shards into {len(self.dataframe)} rows.')
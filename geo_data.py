@@ -1,9 +1,19 @@
 # Standard library imports (https://docs.python.org/3/py-modindex.html)
-import io
+import base64
+import concurrent.futures
+import hashlib
 import json
 import os
 import re
+import tempfile
+import time
+import urllib.parse
+import uuid
 import zipfile
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
 
 # Related third party imports
 from arcgis.features import FeatureLayerCollection
@@ -13,10 +23,33 @@ import requests
 from shapely.wkt import loads
 
 # Local application imports
+from archive_cache import ArchiveCache
+from http_client import HTTPClient
 
 
 
 class GeoData: # Base class
+
+    # Define class attributes:
+    download_chunk_size = 1024 * 1024 # Bytes held in memory while streaming a download
+    download_attempts = 5 # Attempts at resuming an interrupted download before giving up
+    use_archive_cache = False # Set to True in child classes that download bulk archives
+    archive_cache_dirname = 'archive_cache'
+    archive_cache_max_bytes = 5 * 1024**3 # Least recently used archives evicted beyond this
+    archive_cache_max_age = 6 * 60 * 60 # Seconds before a cached archive is re-validated
+    archive_cache = None # Set in get_archive_cache()
+    # If set, e.g. to http://localhost:8000, all web requests go to this offline 
+    #  stand-in for the EA and NBN Atlas services instead - see replay_server.py
+    replay_url = os.environ.get('FLUTR_REPLAY_URL', '')
+    http_pool_size = 200 # Connections kept alive per host; at least the most threads fetching at once
+    http_attempts = 5 # Attempts at a request that fails to connect or gets 429 or 5xx 
+    http_backoff = 1 # Seconds before the first retry, doubling for each one after
+    http_timeout = (10, 120) # Seconds to connect, and to wait for each read
+    http_client = None # Set in get_http_client()
+    items_page_size = 10000 # Items requested at a time by get_all_items() (_limit)
+    max_page_workers = 8 # Pages requested at once by get_all_items()
+    page_retries = 3 # Times get_all_items() requests again a page that came back short
+    caba_boundaries = None # Set in get_caba_boundaries()
           
     def __init__(self, source, dataobject, user):
         self.source = source
@@ -39,6 +72,155 @@ class GeoData: # Base class
         '''
      
 
+    @staticmethod # Since does not access or write to any class attributes
+    def resolve_url(url):
+        # Redirect <url> to the replay server, if one is configured, keeping path and query
+        if not GeoData.replay_url:
+            return url
+        parts = urllib.parse.urlsplit(url)
+        return GeoData.replay_url.rstrip('/') + urllib.parse.urlunsplit(
+            ('', '', parts.path, parts.query, ''))
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def get_http_client():
+        # One HTTPClient, and so one pool of connections, shared by all GeoData objects
+        if GeoData.http_client is None:
+            GeoData.http_client = HTTPClient(GeoData.http_pool_size,
+                                             GeoData.http_attempts,
+                                             GeoData.http_backoff,
+                                             GeoData.http_timeout)
+        return GeoData.http_client
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def http_get(url, **kwargs):
+        # Get <url> using the shared HTTPClient. All web requests should be made this way
+        return GeoData.get_http_client().get(GeoData.resolve_url(url), **kwargs)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def http_get_json(url, **kwargs):
+        # Get and parse the JSON at <url>, raising requests.HTTPError for an error status
+        return GeoData.get_http_client().get_json(GeoData.resolve_url(url), **kwargs)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def http_get_json_items(url, key, fields):
+        # Get the items of array <key> in the JSON at <url>, keeping only <fields> of each
+        return GeoData.get_http_client().get_json_items(GeoData.resolve_url(url), key, fields)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def print_http_stats():
+        # Print how requests to each host went, and where each HostLimiter got to
+        if GeoData.http_client is not None:
+            print('\nRequests by host:')
+            GeoData.http_client.print_stats()
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def get_all_items(url, fields):
+        ''' Get every item of the EA linked data API list at <url> (e.g. the Water 
+             Quality Archive sampling points or Hydrology stations), keeping only 
+             <fields> of each.
+            The APIs do not say how many items a list has, so pages of items_page_size 
+             are requested with _limit and _offset, max_page_workers at a time, until 
+             the last page of a wave comes back empty. A page can come back short, or 
+             empty, by mistake, so the first empty page, and the last page with items 
+             if it is short, are requested again, up to page_retries times, before the 
+             list is taken to end there; and any page that isn't full but is followed 
+             by one with items is requested again, up to page_retries times. If the 
+             pages still don't add up - full pages up to the last one with items - the 
+             run stops rather than carry on with items missing. '''
+        page_size = GeoData.items_page_size
+        separator = '&' if '?' in url else '?'
+        page_fields = ['@id'] + [field for field in fields if field != '@id']
+
+        def get_page(page):
+            return GeoData.http_get_json_items(
+                f'{url}{separator}_limit={page_size}&_offset={page * page_size}',
+                'items', page_fields)
+
+        pages = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=GeoData.max_page_workers) as executor:
+            while True:
+                while not pages or pages[len(pages) - 1]:
+                    wave = range(len(pages), len(pages) + GeoData.max_page_workers)
+                    for (page, items) in zip(wave, executor.map(get_page, wave)):
+                        pages[page] = items
+                    print(f'Got {sum(len(items) for items in pages.values())} items ' \
+                          f'in {len(pages)} pages')
+                last_page = max((page for page in pages if pages[page]), default=-1)
+
+                # Ask again for the pages that end the list, keeping the longer answer, 
+                #  until neither grows
+                end_pages = [last_page + 1]
+                if last_page >= 0 and len(pages[last_page]) < page_size:
+                    end_pages.append(last_page)
+                for attempt in range(GeoData.page_retries):
+                    grown = False
+                    for (page, items) in zip(end_pages, executor.map(get_page, end_pages)):
+                        if len(items) > len(pages[page]):
+                            pages[page] = items
+                            grown = True
+                    if not grown:
+                        break
+                else:
+                    print(f'\nThe end of the list was still changing after ' \
+                          f'{GeoData.page_retries} retries:\n{url}')
+                    raise SystemExit()
+                if not pages[last_page + 1]:
+                    break
+
+                # The list goes on after all: carry on from the page after
+                print(f'\nPage at _offset={(last_page + 1) * page_size} came back empty by ' \
+                      f'mistake; carrying on...')
+                for page in [page for page in pages if page > last_page + 1]:
+                    del pages[page]
+
+            for attempt in range(GeoData.page_retries):
+                short_pages = [page for page in range(last_page) if len(pages[page]) < page_size]
+                if not short_pages:
+                    break
+                print(f'\n{len(short_pages)} pages came back short; requesting them again...')
+                for (page, items) in zip(short_pages, executor.map(get_page, short_pages)):
+                    pages[page] = items
+
+        # Every page before the last with items should be full
+        num_items = sum(len(pages[page]) for page in range(last_page + 1))
+        num_expected = last_page * page_size + len(pages[last_page]) if last_page >= 0 else 0
+        if num_items != num_expected:
+            for page in range(last_page):
+                if len(pages[page]) < page_size:
+                    print(f'\nPage at _offset={page * page_size} has only {len(pages[page])} ' \
+                          f'of {page_size} items after {GeoData.page_retries} retries')
+            print(f'\nGot {num_items} items rather than {num_expected} from:\n{url}')
+            raise SystemExit()
+
+        # Items can still move between pages requested at different times
+        items_list_of_dicts = []
+        ids = set()
+        num_duplicates = 0
+        for page in range(last_page + 1):
+            for item in pages[page]:
+                item_id = item.get('@id')
+                if item_id is not None:
+                    if item_id in ids:
+                        num_duplicates += 1
+                        continue
+                    ids.add(item_id)
+                if '@id' not in fields:
+                    item.pop('@id', None)
+                items_list_of_dicts.append(item)
+
+        if num_duplicates:
+            print(f'\n{num_duplicates} duplicate items left out.')
+        print(f'Total number of items downloaded: {len(items_list_of_dicts)}')
+        return items_list_of_dicts
+
+
     def check_item_already_exists(self):
         # Check existence of AGOL item with id <self.agol_f_layer_id>:       
         if self.agol_f_layer_id != '':
@@ -81,26 +263,288 @@ class GeoData: # Base class
         
         foldername = os.path.splitext(file)[0] # Remove file extension
         to_location = self.user.working_dir + '\\' + foldername
-         
-        zip_file_request = requests.get(url + file)
-        if zip_file_request.status_code != 200:
-            print(f'\nCould not download file {file} from:\n{url}')
-            raise SystemExit()
+        datafiles_path = self.user.working_dir + '\\' + foldername + '\\'
+
+        if self.use_archive_cache:
+            # The entry of this download, which another may since have evicted from the index
+            cache = self.get_archive_cache()
+            entry = self.download_cached_archive(url, file)
+            archive = cache.archive_path(entry)
+            if entry['extracted_to'] == to_location \
+                and entry['extracted_sha256'] == entry['sha256'] \
+                and os.path.isdir(to_location):
+                print(f'Using previously extracted files in:\n{to_location}\\')
+                return datafiles_path
         else:
-            print(f'\nDownloaded file {file} from:\n{url}')
+            archive = self.download_archive(url, file)
 
-        z = zipfile.ZipFile(io.BytesIO(zip_file_request.content))
-        z.extractall(to_location)
+        with zipfile.ZipFile(archive) as z:
+            z.extractall(to_location)
         print(f'\nExtracted {file} to:\n{to_location}\\')
-        
-        datafiles_path = self.user.working_dir + '\\' + foldername + '\\'
+
+        if self.use_archive_cache:
+            cache.set_extracted_to(url + file, to_location, entry['sha256'])
+        else:
+            os.remove(archive)
 
         return datafiles_path
 
 
-    def determine_catchment(self):
+    def download_archive(self, url, file):
+        ''' Download <url><file> without extracting it and return the path of the 
+             archive on disk. With the archive cache, a copy checked against the server 
+             within archive_cache_max_age seconds is reused without any request, which 
+             lets every dataobject that needs the same archive share one download. '''
+
+        if not self.use_archive_cache:
+            # Stream the archive to a temporary file so it never sits in memory
+            (downloaded, _, _) = self.download_to_file(url, file)
+            archive = os.path.join(self.user.working_dir, file)
+            os.replace(downloaded, archive)
+            return archive
+
+        return self.get_archive_cache().archive_path(self.download_cached_archive(url, file))
+
+
+    def download_cached_archive(self, url, file):
+        ''' Download <url><file> into the archive cache, unless a copy checked within 
+             archive_cache_max_age seconds is there, and return its cache entry. '''
+        cache = self.get_archive_cache()
+        entry = cache.get(url + file)
+        if entry is not None and cache.is_fresh(entry):
+            print(f'\nUsing cached copy of {file} from:\n{url}')
+            cache.touch(url + file)
+            return entry
+
+        # Conditional GET: a 304 response means the cached archive is still current
+        (downloaded, response_headers, sha256) = \
+            self.download_to_file(url, file, headers=cache.validators(url + file) if entry else {})
+
+        if downloaded is None:
+            print(f'\n{file} not modified since last download from:\n{url}')
+            cache.touch(url + file, checked=True)
+            return entry
+
+        return cache.store(url + file, downloaded, response_headers, sha256)
+
+
+    def get_archive_cache(self):
+        # One ArchiveCache shared by all GeoData objects
+        if GeoData.archive_cache is None:
+            GeoData.archive_cache = ArchiveCache(
+                os.path.join(self.user.working_dir, GeoData.archive_cache_dirname),
+                GeoData.archive_cache_max_bytes,
+                GeoData.archive_cache_max_age)
+        return GeoData.archive_cache
+
+
+    def download_to_file(self, url, file, headers=None):
+        ''' Download <url><file> in chunks of GeoData.download_chunk_size bytes to the 
+             partial file <file>.part in the working directory. Peak memory is one chunk, 
+             however large the file. If the connection drops, the download is resumed 
+             with an HTTP Range request rather than restarted from byte zero, and the 
+             same happens for a partial file left behind by an earlier run. The result 
+             is checked against the expected size and any digest sent by the server 
+             before it is used.
+            Only one download at a time, in any thread or process, writes to 
+             <file>.part: another download of the same file meanwhile goes to a partial 
+             file of its own, which is not kept for a later run to resume.
+            Returns the file's path, the response headers and the file's sha256; the 
+             path is None if the server replied 304 Not Modified to a conditional 
+             request. '''
+        
+        partial_file = os.path.join(self.user.working_dir, file + '.part')
+        lock = GeoData.lock_file(partial_file + '.lock')
+        if lock is None:
+            partial_file = os.path.join(self.user.working_dir, f'{file}.{uuid.uuid4().hex}.part')
+            print(f'\n{file} is already being downloaded elsewhere; downloading to:\n{partial_file}')
+        try:
+            return self.download_to_partial_file(url, file, headers, partial_file, lock is not None)
+        finally:
+            if lock is not None:
+                lock.close() # Releases the lock
+            else: # Left only if the download failed
+                for path in [partial_file, partial_file + '.json']:
+                    if os.path.isfile(path):
+                        os.remove(path)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def lock_file(lock_file):
+        ''' Open and lock <lock_file> without waiting, and return the open file, to be 
+             closed to release the lock, or None if it is locked by another thread or 
+             process. The OS releases the lock if the process holding it dies. '''
+        output_file = open(lock_file, 'w')
+        try:
+            if os.name == 'nt':
+                msvcrt.locking(output_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(output_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            output_file.close()
+            return None
+        return output_file
+
+
+    def download_to_partial_file(self, url, file, headers, partial_file, resumable):
+        # As download_to_file(), to <partial_file>, which a later run can resume if <resumable>
+        partial_info_file = partial_file + '.json'
+        partial_info = {}
+        if os.path.isfile(partial_file) and os.path.isfile(partial_info_file):
+            with open(partial_info_file, 'r') as input_file:
+                partial_info = json.load(input_file)
+            if partial_info.get('url') != url + file:
+                partial_info = {}
+        if not partial_info and os.path.isfile(partial_file):
+            os.remove(partial_file) # Can't tell what this partial file belongs to
+
+        start = time.perf_counter()
+        num_bytes = 0
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            offset = os.path.getsize(partial_file) if partial_info else 0
+
+            # Uncompressed, so that byte ranges and sizes refer to the file itself
+            request_headers = dict(headers or {}, **{'Accept-Encoding': 'identity'})
+            if offset > 0:
+                # Resume, unless the file has changed since the partial file was started 
+                request_headers.pop('If-None-Match', None)
+                request_headers.pop('If-Modified-Since', None)
+                request_headers['Range'] = f'bytes={offset}-'
+                if partial_info.get('etag') or partial_info.get('last_modified'):
+                    request_headers['If-Range'] = \
+                        partial_info.get('etag') or partial_info.get('last_modified')
+                print(f'\nResuming download of {file} from byte {offset}...')
+
+            try:
+                with GeoData.http_get(url + file, headers=request_headers, 
+                                      stream=True) as file_request:
+                    response_headers = file_request.headers
+                    status_code = file_request.status_code
+
+                    if status_code == 304:
+                        return (None, response_headers, '')
+                    
+                    if status_code == 416: # Requested range not satisfiable
+                        print(f'Server rejected resume of {file}. Restarting download.')
+                        os.remove(partial_file)
+                        partial_info = {}
+                        continue
+
+                    if status_code == 206:
+                        (range_start, total) = \
+                            GeoData.parse_content_range(response_headers.get('Content-Range', ''))
+                        if range_start != offset:
+                            raise SystemExit(f'Unexpected Content-Range resuming {file}: ' \
+                                             f"{response_headers.get('Content-Range')}")
+                        mode = 'ab'
+                    elif status_code == 200:
+                        total = int(response_headers.get('Content-Length', -1))
+                        mode = 'wb'
+                        partial_info = {'url': url + file,
+                                        'etag': response_headers.get('ETag', ''),
+                                        'last_modified': response_headers.get('Last-Modified', ''),
+                                        'total': total}
+                        with open(partial_info_file, 'w') as output_file:
+                            json.dump(partial_info, output_file)
+                    else:
+                        print(f'\nCould not download file {file} from:\n{url}')
+                        raise SystemExit()
+
+                    with open(partial_file, mode) as output_file:
+                        for chunk in file_request.iter_content(chunk_size=GeoData.download_chunk_size):
+                            output_file.write(chunk)
+                            num_bytes += len(chunk)
+
+                if 0 <= total and os.path.getsize(partial_file) < total:
+                    # Connection closed early without an error being raised
+                    raise requests.exceptions.ConnectionError(
+                        f'{os.path.getsize(partial_file)} of {total} bytes received')
+                break
+
+            except requests.exceptions.RequestException as error:
+                if attempt >= GeoData.download_attempts:
+                    if not resumable:
+                        print(f'\nDownload of {file} failed after {attempt} attempts.')
+                        raise SystemExit()
+                    print(f'\nDownload of {file} failed after {attempt} attempts. ' \
+                          f'Partial file kept for next run:\n{partial_file}')
+                    raise SystemExit()
+                print(f'\nDownload of {file} interrupted ({error!r}). Retrying...')
+                time.sleep(GeoData.http_backoff * 2 ** attempt)
+
+        seconds = max(time.perf_counter() - start, 1e-6)
+        print(f'\nDownloaded file {file} from:\n{url}')
+        print(f'{num_bytes / 1e6:.1f} MB in {seconds:.1f} s ' \
+              f'({num_bytes / 1e6 / seconds:.2f} MB/s)')
+
+        sha256 = self.verify_download(partial_file, file, total, response_headers, 
+                                      status_code == 200)
+        os.remove(partial_info_file)
+
+        # Rename so that a later download of the same file can't resume into it
+        (fd, archive) = tempfile.mkstemp(prefix=file + '.', suffix='.download', 
+                                         dir=self.user.working_dir)
+        os.close(fd)
+        os.replace(partial_file, archive)
+
+        return (archive, response_headers, sha256)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def parse_content_range(content_range):
+        # Return (first byte, total size) from e.g. 'bytes 1000-1999/5000'
+        match = re.fullmatch(r'bytes (\d+)-\d+/(\d+|\*)', content_range.strip())
+        if match is None:
+            return (-1, -1)
+        total = -1 if match.group(2) == '*' else int(match.group(2))
+        return (int(match.group(1)), total)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def verify_download(path, file, total, response_headers, whole_response):
+        ''' Check a completed download against its expected size and, where the 
+             server sent one, its digest, then return its sha256. The partial file 
+             is deleted if the check fails, so the next attempt starts afresh. '''
+        size = os.path.getsize(path)
+        problem = ''
+        if total >= 0 and size != total:
+            problem = f'expected {total} bytes, got {size}'
+
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        with open(path, 'rb') as input_file:
+            for chunk in iter(lambda: input_file.read(GeoData.download_chunk_size), b''):
+                sha256.update(chunk)
+                md5.update(chunk)
+
+        # 'Digest: sha-256=<base64>' describes the whole file, Content-MD5 only the body
+        digest = re.search(r'sha-256=([A-Za-z0-9+/=]+)', response_headers.get('Digest', ''))
+        if not problem and digest \
+            and base64.b64decode(digest.group(1)) != sha256.digest():
+            problem = 'sha-256 digest mismatch'
+        content_md5 = response_headers.get('Content-MD5', '')
+        if not problem and whole_response and content_md5 \
+            and base64.b64decode(content_md5) != md5.digest():
+            problem = 'Content-MD5 mismatch'
+        if not problem and file.endswith('.zip') and not zipfile.is_zipfile(path):
+            problem = 'not a valid zip archive'
+
+        if problem:
+            os.remove(path)
+            print(f'\nDownloaded file {file} failed verification: {problem}.')
+            raise SystemExit()
+
+        print(f'Verified {file}: {size} bytes, sha256 {sha256.hexdigest()}')
+        return sha256.hexdigest()
 
-        print(f'\nDetermining catchments using sjoin()...\n')
+
+    def get_caba_boundaries(self):
+        # Load the CaBA catchment boundaries once, however many GeoData objects use them
+        if GeoData.caba_boundaries is not None:
+            return GeoData.caba_boundaries
 
         # Set filepath - this could be a class variable or it could be downloaded
         caba_data_shapefile = '\\CaBA_Partnership_boundaries\\CaBA_Partnership_boundaries.shp'
@@ -118,6 +562,16 @@ class GeoData: # Base class
             return "{:.6f}".format(float(match.group()))
         gdf_caba.geometry = gdf_caba.geometry.apply(lambda x: loads(re.sub(simpledec, mround, x.wkt)))
 
+        GeoData.caba_boundaries = gdf_caba
+        return gdf_caba
+
+
+    def determine_catchment(self):
+
+        print(f'\nDetermining catchments using sjoin()...\n')
+
+        gdf_caba = self.get_caba_boundaries()
+
         # Construct a geodataframe from self.dataframe. NB EPSG:4326 is WGS84
         gdf_data_obj = geopandas.GeoDataFrame(
             self.dataframe, 
@@ -162,6 +616,12 @@ class GeoData: # Base class
 #        print(self.dataframe.columns.tolist())
 #        raise SystemExit()
 
+        # Categorical columns (see EAEcologyAndFishData.read_datafile()) can't take 
+        #  the empty strings written below, so convert them back to str
+        categorical_columns = self.dataframe.select_dtypes(include='category').columns
+        self.dataframe[categorical_columns] = \
+            self.dataframe[categorical_columns].astype(object)
+
         # Write empty strings to any Null values in new CaBA columns
         self.dataframe = self.dataframe.fillna("")
         
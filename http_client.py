@@ -0,0 +1,336 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import codecs
+import json
+import re
+import threading
+import time
+import urllib.parse
+
+
+# Related third party imports
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Local application imports
+
+
+class HTTPClient:
+    ''' One requests Session, shared by every GeoData object and thread, so that
+         connections (and their TLS handshakes) to each host are pooled and kept
+         alive between requests rather than made afresh for each one.
+        Every request has a timeout, asks for a gzip compressed response and is
+         retried, with exponential backoff (and honouring any Retry-After header),
+         if the connection fails or the server replies 429 or 5xx.
+        Requests to each host go through that host's HostLimiter, which adapts how 
+         many are made at once and pauses the host if it keeps failing. '''
+
+    # Define class attributes:
+    retry_statuses = (429, 500, 502, 503, 504)
+    stream_chunk_size = 64 * 1024 # Bytes of a streamed response decoded at a time
+
+
+    def __init__(self, pool_size, attempts, backoff, timeout):
+        self.timeout = timeout # (connect, read) seconds
+        retry = Retry(total=attempts - 1,
+                      backoff_factor=backoff, # Waits backoff, 2*backoff, 4*backoff... seconds
+                      status_forcelist=HTTPClient.retry_statuses,
+                      allowed_methods=frozenset(['GET', 'HEAD']),
+                      respect_retry_after_header=True,
+                      raise_on_status=False) # Caller sees the last response
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+
+        self.max_in_flight = pool_size
+        self.limiters = {} # HostLimiter for each host, set in get_limiter()
+        self.limiters_lock = threading.Lock()
+
+
+    def get_limiter(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.limiters_lock:
+            if host not in self.limiters:
+                self.limiters[host] = HostLimiter(host, self.max_in_flight)
+            return self.limiters[host]
+
+
+    def get(self, url, **kwargs):
+        # NB for a streamed response, the host's slot is given back once the headers arrive
+        kwargs.setdefault('timeout', self.timeout)
+        limiter = self.get_limiter(url)
+        test = limiter.acquire()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.session.get(url, **kwargs)
+        finally:
+            limiter.release(time.perf_counter() - start, response, test)
+        return response
+
+
+    def print_stats(self):
+        for host in sorted(self.limiters):
+            print(self.limiters[host])
+
+
+    def get_json(self, url, **kwargs):
+        # Get <url>, raising requests.HTTPError for an error status, and parse it once
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return json.loads(response.content)
+
+
+    def get_json_items(self, url, key, fields):
+        ''' Get <url> and return the items of the top level array <key> in its JSON, 
+             each reduced to those of <fields> it has. The response is parsed as it 
+             streams in, one item at a time, so only the reduced items are held in 
+             memory rather than the whole response and its parsed tree. '''
+        with self.get(url, stream=True) as response:
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            text_chunks = (decoder.decode(chunk) for chunk in 
+                           response.iter_content(chunk_size=HTTPClient.stream_chunk_size))
+            return [{field: item[field] for field in fields if field in item}
+                    for item in JSONItemStream(text_chunks, key)]
+
+
+class HostLimiter:
+    ''' Limits the requests in flight to one host, adapting the limit to how the host 
+         copes (additive increase, multiplicative decrease, as in TCP). The limit is 
+         revised each round trip, i.e. once as many responses as the limit have come 
+         back: if more than strain_threshold of them showed strain - a 429 or 503 reply 
+         (including those retried by the HTTPClient) or a failure - the limit is 
+         halved; if most were latency_factor times slower than the fastest seen, it is 
+         held; otherwise it doubles, until the host first shows strain, then grows by 
+         one. An odd error doesn't cut the limit, but a host that starts throttling 
+         or slowing down soon gets fewer requests.
+        After breaker_threshold requests in a row fail, the circuit breaker opens: 
+         requests wait breaker_cooldown seconds (doubling each time it re-opens) and 
+         then one is let through to test the host. If that succeeds requests resume; 
+         if the breaker opens breaker_max_opens times without a success, requests 
+         fail at once rather than waiting on a host that is down. '''
+
+    # Define class attributes:
+    initial_limit = 8 # Requests in flight to a host to start with
+    decrease_factor = 0.5 # Limit multiplied by this when the host shows strain
+    strain_threshold = 0.2 # Fraction of a round trip's responses showing strain that cuts the limit
+    latency_factor = 5 # Limit held while responses are this many times slower than the fastest
+    strain_statuses = (429, 503)
+    breaker_threshold = 5 # Failed requests in a row that open the circuit breaker
+    breaker_cooldown = 15 # Seconds before the first test request to the host
+    breaker_max_cooldown = 300
+    breaker_max_opens = 5 # Opens in a row, without a success, before giving up on the host
+
+
+    def __init__(self, host, max_limit):
+        self.host = host
+        self.max_limit = max_limit
+        self.limit = min(HostLimiter.initial_limit, max_limit)
+        self.slow_start = True # Until the host first shows strain
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+        self.fastest = None # Seconds
+        self.round_trip = {'responses': 0, 'strained': 0, 'slow': 0}
+
+        self.consecutive_failures = 0
+        self.consecutive_opens = 0
+        self.open_until = 0.0 # Circuit breaker open until this time.monotonic()
+        self.testing = False # A test request is in flight while the breaker is half open
+
+        self.stats = {'requests': 0, 'failures': 0, 'strained': 0, 'decreases': 0, 
+                      'breaker opens': 0, 'seconds': 0.0, 'peak limit': self.limit}
+
+
+    def acquire(self):
+        # Wait for a slot. Returns True if this is the request testing a paused host
+        with self.condition:
+            while True:
+                if self.consecutive_opens >= HostLimiter.breaker_max_opens:
+                    raise requests.ConnectionError(
+                        f'{self.host} failed {self.stats["failures"]} requests; ' \
+                        f'its circuit breaker opened {self.consecutive_opens} times in a row')
+                wait = self.open_until - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                elif self.open_until and self.testing:
+                    self.condition.wait() # Half open: one test request at a time
+                elif self.open_until or self.in_flight < self.limit:
+                    break
+                else:
+                    self.condition.wait()
+            test = bool(self.open_until)
+            self.testing = test
+            self.in_flight += 1
+            self.stats['requests'] += 1
+            return test
+
+
+    def release(self, elapsed, response, test):
+        ''' Record how the request went: <response> is None if it raised, e.g. 
+             because the host could not be reached, and <test> is what acquire() 
+             returned. '''
+        strained = 0
+        if response is not None:
+            retries = getattr(response.raw, 'retries', None)
+            history = retries.history if retries is not None else ()
+            strained = sum(1 for attempt in history if attempt.status in HostLimiter.strain_statuses)
+            strained += response.status_code in HostLimiter.strain_statuses
+        failed = response is None or response.status_code == 429 or response.status_code >= 500
+
+        with self.condition:
+            self.in_flight -= 1
+            if test:
+                self.testing = False
+            self.stats['seconds'] += elapsed
+            self.stats['strained'] += strained
+            if self.fastest is None or elapsed < self.fastest:
+                self.fastest = elapsed
+
+            if failed:
+                self.stats['failures'] += 1
+                self.consecutive_failures += 1
+                # Requests already in flight when the breaker opened don't re-open it
+                if test or (not self.open_until 
+                            and self.consecutive_failures >= HostLimiter.breaker_threshold):
+                    self.open_breaker()
+            else:
+                self.consecutive_failures = 0
+                self.consecutive_opens = 0
+                self.open_until = 0.0
+
+            self.round_trip['responses'] += 1
+            self.round_trip['strained'] += bool(strained or failed)
+            self.round_trip['slow'] += elapsed > HostLimiter.latency_factor * self.fastest
+            if self.round_trip['responses'] >= self.limit:
+                self.revise_limit()
+            self.condition.notify_all()
+
+
+    def revise_limit(self):
+        # Revise the limit at the end of a round trip. NB caller holds self.condition
+        round_trip = self.round_trip
+        if round_trip['strained'] > HostLimiter.strain_threshold * round_trip['responses']:
+            self.slow_start = False
+            self.limit = max(int(self.limit * HostLimiter.decrease_factor), 1)
+            self.stats['decreases'] += 1
+        elif round_trip['slow'] > round_trip['responses'] / 2:
+            self.slow_start = False
+        elif self.slow_start:
+            self.limit = min(self.limit * 2, self.max_limit)
+        else:
+            self.limit = min(self.limit + 1, self.max_limit)
+        self.stats['peak limit'] = max(self.stats['peak limit'], self.limit)
+        self.round_trip = {'responses': 0, 'strained': 0, 'slow': 0}
+
+
+    def open_breaker(self):
+        # NB caller holds self.condition
+        cooldown = min(HostLimiter.breaker_cooldown * 2 ** self.consecutive_opens,
+                       HostLimiter.breaker_max_cooldown)
+        self.consecutive_opens += 1
+        self.consecutive_failures = 0
+        self.open_until = time.monotonic() + cooldown
+        self.stats['breaker opens'] += 1
+        print(f'\n{self.host} failed {HostLimiter.breaker_threshold} requests in a row; ' \
+              f'pausing requests to it for {cooldown} seconds')
+
+
+    def __str__(self):
+        stats = self.stats
+        mean = stats['seconds'] / stats['requests'] if stats['requests'] else 0
+        return f"{self.host}: {stats['requests']} requests, {stats['failures']} failed, " \
+               f"{stats['strained']} 429/503 replies, mean {mean:.2f} s; " \
+               f"limit {self.limit} (peak {stats['peak limit']}), " \
+               f"{stats['decreases']} decreases, {stats['breaker opens']} circuit breaker opens"
+
+
+class JSONItemStream:
+    ''' Iterates over the items of the array <key> in a JSON object, e.g. 
+         {"meta": {...}, "items": [{...}, {...}]}, arriving as <text_chunks>. Each item 
+         is decoded with json.JSONDecoder.raw_decode() as soon as it is complete; the 
+         text before it is then discarded. '''
+
+    whitespace = re.compile(r'\s*')
+
+
+    def __init__(self, text_chunks, key):
+        self.text_chunks = iter(text_chunks)
+        self.key = key
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+
+
+    def fill(self):
+        # Append the next chunk to the buffer, dropping what has been parsed. False at end
+        chunk = next(self.text_chunks, None)
+        if chunk is None:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+
+    def peek(self):
+        # Return the next character that isn't whitespace, without consuming it
+        while True:
+            self.position = JSONItemStream.whitespace.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError('JSON ended unexpectedly')
+
+
+    def take(self, expected):
+        if self.peek() not in expected:
+            raise ValueError(f'Expected one of {expected!r} in JSON at ' \
+                             f'{self.buffer[self.position:self.position + 40]!r}')
+        self.position += 1
+        return self.buffer[self.position - 1]
+
+
+    def decode(self):
+        # Decode the next complete JSON value, reading more chunks until there is one
+        self.peek()
+        while True:
+            try:
+                (value, end) = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number may continue in the next chunk, e.g. '12.' then '5', so is only 
+            #  taken once the character after it shows where it ends
+            if not isinstance(value, (str, dict, list)):
+                after = JSONItemStream.whitespace.match(self.buffer, end).end()
+                if (after == len(self.buffer) or self.buffer[after] not in ',]}:') \
+                    and self.fill():
+                    continue
+            self.position = end
+            return value
+
+
+    def __iter__(self):
+        self.take('{')
+        if self.peek() == '}':
+            return
+        while True:
+            name = self.decode()
+            self.take(':')
+            if name == self.key:
+                self.take('[')
+                if self.peek() == ']':
+                    return
+                while True:
+                    yield self.decode()
+                    if self.take(',]') == ']':
+                        return # Nothing after the array is needed
+            self.decode() # Skip the value of any other key
+            if self.take(',}') == '}':
+                return
@@ -1,15 +1,16 @@
 # Standard library imports (https://docs.python.org/3/py-modindex.html)
+import concurrent.futures
+import datetime
 import json
 import math
+import os
 import re
+import urllib.parse
 
 # Related third party imports
 import geopandas
 import osgb # need to do a 'pip3 install osgb' from command line
 import pandas
-import requests
-from shapely.wkt import loads
-from shapely import wkt
 
 # Local application imports
 from geo_data import GeoData
@@ -25,69 +26,219 @@ used to construct a class object
 class NBNatlasOccurrences(GeoData):
    
     # Define class attributes:
-    url_records = 'https://records-ws.nbnatlas.org/occurrences/search?q='
-    occurrences_list_of_dicts = []
+    url_records = 'https://records-ws.nbnatlas.org/occurrences/search'
+    # Fields returned by the API (index field: name in response), i.e. those used by 
+    #  construct_df() plus uuid, used to de-duplicate and merge occurrences
+    fields = {'id': 'uuid',
+              'data_provider': 'dataProviderName',
+              'latitude': 'decimalLatitude',
+              'longitude': 'decimalLongitude',
+              'coordinate_uncertainty': 'coordinateUncertaintyInMeters',
+              'grid_reference': 'gridReference',
+              'identification_verification_status': 'identificationVerificationStatus',
+              'license': 'license',
+              'location_id': 'locationId',
+              'taxon_name': 'scientificName',
+              'common_name': 'vernacularName',
+              'year': 'year'}
+    # Occurrences with these licences are not returned, as they cannot be used for 
+    #  commercial purposes without prior agreement of the data provider
+    exclude_licences = ['CC-BY-NC']
+    # Occurrences lacking any of these fields are not returned
+    required_fields = ['latitude', 'longitude', 'coordinate_uncertainty']
+    page_size = 10000 # Maximum number of occurrences returned per request
+    max_page_workers = 4 # Number of pages requested concurrently
+    max_species_workers = 4 # Number of species got concurrently by get_data_batch()
+    incremental_sync = True # Only get occurrences loaded since the last run, see load_snapshot()
+    snapshot_dirname = 'nbn_snapshots'
+    snapshot_overlap = 24 * 60 * 60 # Seconds before the last run started to get occurrences from
+    full_refresh_days = 30 # Days between getting every occurrence again
 
                 
     def get_data(self): # Using NBN Atlas API
     
+        run_started = datetime.datetime.now(datetime.timezone.utc)
+        self.url_query = NBNatlasOccurrences.build_query(self.dataobject)
+
+        snapshot = self.load_snapshot() if NBNatlasOccurrences.incremental_sync else None
+
+        if snapshot is None:
+            occurrences = self.get_occurrences(self.url_query)
+            full_refresh = run_started.isoformat()
+        else:
+            # Only get occurrences loaded into the NBN Atlas since the last run
+            print(f'\n{len(snapshot["occurrences"])} occurrences of {self.dataobject} ' \
+                  f'in local snapshot. Getting those loaded since {snapshot["watermark"]}...')
+            new_occurrences = self.get_occurrences(
+                self.url_query + '&fq=' \
+                    + urllib.parse.quote(f'last_load_date:[{snapshot["watermark"]} TO *]'))
+            occurrences = NBNatlasOccurrences.merge_occurrences(snapshot['occurrences'], 
+                                                               new_occurrences)
+            full_refresh = snapshot['full_refresh']
+
+        if (len(occurrences) == 0):
+            raise SystemExit()
+
+        # Next run gets occurrences loaded since this one started, less an overlap for
+        #  loads that were in progress
+        watermark = run_started - datetime.timedelta(seconds=NBNatlasOccurrences.snapshot_overlap)
+        self.save_snapshot({'query': self.url_query,
+                            'watermark': watermark.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                            'full_refresh': full_refresh,
+                            'occurrences': occurrences})
+
+        self.occurrences_list_of_dicts = occurrences
+        print(f'Total number of occurrences: {len(occurrences)}')
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def build_query(species):
+        ''' Return the search URL for present occurrences of <species>. Only the fields
+             in NBNatlasOccurrences.fields are returned, and occurrences with an excluded
+             licence, or lacking coordinates or their uncertainty, are filtered out by 
+             the API, so are never transferred or parsed. '''
+        filter_queries = ['occurrence_status:present']
+        filter_queries += [f'-license:"{licence}"' 
+                           for licence in NBNatlasOccurrences.exclude_licences]
+        filter_queries += [f'{field}:[* TO *]' 
+                           for field in NBNatlasOccurrences.required_fields]
+
+        return NBNatlasOccurrences.url_records \
+            + '?q=' + urllib.parse.quote(f'"{species}"') \
+            + ''.join(['&fq=' + urllib.parse.quote(filter_query) 
+                       for filter_query in filter_queries]) \
+            + '&fl=' + ','.join(NBNatlasOccurrences.fields)
+
+
+    def get_occurrences(self, url_query):
+        # Get every occurrence matching <url_query>, max_page_workers pages concurrently
+
         # Determine number of observations
-        NBNatlasOccurrences.url_records = \
-            NBNatlasOccurrences.url_records + '"' + self.dataobject + '"' \
-                + '&fq=occurrence_status:present'
-                  
         print(f'\nGetting occurrence count of {self.dataobject} ' \
-              f'from NBN Atlas API:\n{NBNatlasOccurrences.url_records}\n')
-        occurrences_response = requests.get(f'{NBNatlasOccurrences.url_records}')
-
-        occurrences_response_dict = json.loads(occurrences_response.text) # JSON object
+              f'from NBN Atlas API:\n{url_query}\n')
+        occurrences_response_dict = GeoData.http_get_json(url_query + '&pageSize=0') # Count only
 
         num_observations = occurrences_response_dict['totalRecords']
         print(f'\n{num_observations} occurrences of {self.dataobject} found.')
 
         if (num_observations == 0):
+            return []
+
+        # Get data, num_returned_max at a time, max_page_workers pages concurrently
+        num_returned_max = NBNatlasOccurrences.page_size
+        start_indices = range(0, num_observations, num_returned_max)
+        pages = [None] * len(start_indices)
+        failures = []
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=NBNatlasOccurrences.max_page_workers) as executor:
+            futures = {executor.submit(self.get_page, url_query, start_index, num_returned_max): index 
+                       for (index, start_index) in enumerate(start_indices)}
+
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    pages[index] = future.result()
+                except Exception as error:
+                    failures.append((start_indices[index], error))
+                    continue
+                print(f'Number of occurrences downloaded from startIndex ' \
+                      f'{start_indices[index]}: {len(pages[index])}')
+
+        if failures:
+            for (start_index, error) in failures:
+                print(f'\nFailed to get occurrences from startIndex {start_index}: {error!r}')
             raise SystemExit()
 
-        # Get data, num_returned_max at a time
-        num_returned_max = 10000
-        page_size = num_returned_max
-        start_index = 0
-        total_num_downloaded = 0
-        
-        while total_num_downloaded < num_observations:
-        
-            url = \
-                NBNatlasOccurrences.url_records \
-                    + '&pageSize=' \
-                    + str(num_returned_max) \
-                    + '&startIndex=' \
-                    + str(start_index)
-
-            print(f'\nGetting occurrence data of {self.dataobject} ' \
-                  f'from NBN Atlas API:\n{url}\n')
-            occurrences_response = requests.get(f'{url}')
-            
-            # Join any downloaded occurrences to NBNatlasOccurrences.occurrences_list_of_dicts
-            NBNatlasOccurrences.occurrences_list_of_dicts = \
-                NBNatlasOccurrences.occurrences_list_of_dicts \
-                    + json.loads(occurrences_response.text)['occurrences'] 
-                                      
-            num_downloaded = len(json.loads(occurrences_response.text)['occurrences']) 
-            total_num_downloaded += num_downloaded
-            print(f'Number of occurrences downloaded: {num_downloaded}')
-            print(f'Total number of occurrences downloaded: {total_num_downloaded}')
-                       
-            start_index += num_returned_max
+        # Reassemble pages in order, dropping any occurrence seen on an earlier page 
+        #  (records can shift between pages if the data changes while downloading)
+        occurrences = []
+        uuids = set()
+        for page in pages:
+            for occurrence in page:
+                uuid = occurrence.get('uuid')
+                if uuid is not None:
+                    if uuid in uuids:
+                        continue
+                    uuids.add(uuid)
+                occurrences.append(occurrence)
+
+        print(f'Total number of occurrences downloaded: {len(occurrences)}')
+        return occurrences
+
+
+    def get_page(self, url_query, start_index, page_size):
+        # Get the page of <page_size> occurrences matching <url_query> starting at <start_index>
+        url = \
+            url_query \
+                + '&pageSize=' \
+                + str(page_size) \
+                + '&startIndex=' \
+                + str(start_index)
+
+        print(f'\nGetting occurrence data of {self.dataobject} ' \
+              f'from NBN Atlas API:\n{url}\n')
+        return GeoData.http_get_json(url)['occurrences']
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def merge_occurrences(occurrences, new_occurrences):
+        # Add <new_occurrences> to <occurrences>, replacing any with the same uuid
+        merged = {occurrence['uuid']: occurrence for occurrence in occurrences 
+                  if 'uuid' in occurrence}
+        no_uuid = [occurrence for occurrence in occurrences if 'uuid' not in occurrence]
+        num_updated = 0
+        for occurrence in new_occurrences:
+            if 'uuid' not in occurrence:
+                no_uuid.append(occurrence)
+                continue
+            if occurrence['uuid'] in merged:
+                num_updated += 1
+            merged[occurrence['uuid']] = occurrence
+        print(f'{len(new_occurrences) - num_updated} new and {num_updated} updated occurrences ' \
+              f'merged into snapshot.')
+        return list(merged.values()) + no_uuid
+
+
+    def snapshot_file(self):
+        return os.path.join(self.user.working_dir, NBNatlasOccurrences.snapshot_dirname, 
+                            re.sub(r'\W+', '_', self.dataobject) + '.json')
+
+
+    def load_snapshot(self):
+        ''' Return the snapshot saved by the last successful run, or None if there isn't 
+             one, it was made with a different query, or it is due a full refresh. A 
+             full refresh picks up occurrences deleted, or no longer present, since. '''
+        snapshot_file = self.snapshot_file()
+        if not os.path.isfile(snapshot_file):
+            return None
+        with open(snapshot_file, 'r') as input_file:
+            snapshot = json.load(input_file)
+
+        if snapshot.get('query') != self.url_query:
+            print(f'\nQuery has changed since last snapshot. Getting all occurrences.')
+            return None
+        age = datetime.datetime.now(datetime.timezone.utc) \
+            - datetime.datetime.fromisoformat(snapshot['full_refresh'])
+        if age > datetime.timedelta(days=NBNatlasOccurrences.full_refresh_days):
+            print(f'\nLast full refresh was {age.days} days ago. Getting all occurrences.')
+            return None
+        return snapshot
+
+
+    def save_snapshot(self, snapshot):
+        snapshot_file = self.snapshot_file()
+        os.makedirs(os.path.dirname(snapshot_file), exist_ok=True)
+        temp_file = snapshot_file + '.tmp'
+        with open(temp_file, 'w') as output_file:
+            json.dump(snapshot, output_file)
+        os.replace(temp_file, snapshot_file)
+        print(f'\nSaved snapshot of {len(snapshot["occurrences"])} occurrences to:\n{snapshot_file}')
                     
 
     def process_data(self):
         # Construct dataframe and write result to base class attribute 'dataframe'
-        self.dataframe = \
-            self.construct_df(NBNatlasOccurrences.occurrences_list_of_dicts)
-         
-        # Calculate square occurrence regions to display on map
-        self.dataframe = \
-            self.calculate_osgb_polygon(self.dataframe)
+        self.prepare_data()
 
         # Determine CaBA catchments 
         self.determine_catchment()            
@@ -95,6 +246,67 @@ class NBNatlasOccurrences(GeoData):
               
          # Append 'placeholder'
         self.append_placeholder()
+
+
+    def prepare_data(self):
+        # The steps of process_data() before determining catchments
+        self.dataframe = \
+            self.construct_df(self.occurrences_list_of_dicts)
+         
+        # Calculate square occurrence regions to display on map
+        self.dataframe = \
+            self.calculate_osgb_polygon(self.dataframe)
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def get_data_batch(geodata_objs):
+        ''' Call get_data() for each of <geodata_objs>, one per species, using a bounded 
+             pool of threads. They share the pooled HTTP session, and each pages 
+             concurrently too. '''
+        failures = []
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=NBNatlasOccurrences.max_species_workers) as executor:
+            futures = {executor.submit(geodata_obj.get_data): geodata_obj 
+                       for geodata_obj in geodata_objs}
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except BaseException as error: # Includes SystemExit raised on failure
+                    failures.append((futures[future].dataobject, error))
+
+        if failures:
+            for (species, error) in failures:
+                print(f'\nFailed to get occurrences of {species}: {error!r}')
+            raise SystemExit()
+
+
+    @staticmethod # Since does not access or write to any class attributes
+    def process_data_batch(geodata_objs):
+        ''' Equivalent to calling process_data() for each of <geodata_objs>, but 
+             determining the catchments of every species' occurrences in one spatial 
+             join, then splitting the result back into each object's dataframe. '''
+        for geodata_obj in geodata_objs:
+            geodata_obj.prepare_data()
+
+        batch_obj = geodata_objs[0] # Carries the combined dataframe through the join
+        batch_obj.dataframe = pandas.concat(
+            [geodata_obj.dataframe.assign(batch_index=index) 
+             for (index, geodata_obj) in enumerate(geodata_objs)], 
+            ignore_index=True)
+
+        batch_obj.determine_catchment()
+        batch_dataframe = batch_obj.dataframe
+
+        for geodata_obj in geodata_objs: # In case a species has no rows left
+            geodata_obj.dataframe = batch_dataframe.iloc[0:0].drop(columns=['batch_index'])
+        for (index, dataframe) in batch_dataframe.groupby('batch_index', sort=False):
+            geodata_objs[index].dataframe = \
+                dataframe.drop(columns=['batch_index']).reset_index(drop=True)
+
+        for geodata_obj in geodata_objs:
+            geodata_obj.append_placeholder()
        
        
     @staticmethod # Since does not access or write to any class attributes  
@@ -116,7 +328,8 @@ class NBNatlasOccurrences(GeoData):
                             'vernacularName',
 #                            'month',
                             'year']
-        dataframe = dataframe[columns_required]
+        # NB reindex, since a field the API returns for no occurrence is absent altogether
+        dataframe = dataframe.reindex(columns=columns_required)
         dataframe = dataframe.sort_values(['locationId'], ascending=[True], ignore_index=True)
 #        dataframe = dataframe.sort_values(['coordinateUncertaintyInMeters'], ascending=[False], ignore_index=True)
         renaming = {'decimalLatitude': 'lat', 
@@ -128,6 +341,8 @@ class NBNatlasOccurrences(GeoData):
         
         num_rows = len(dataframe)
         
+        # NB the query already excludes the rows dropped below (see build_query()), so 
+        #  these are checks which should remove none
         # Drop any rows that lack lat/long data
         dataframe = dataframe.dropna(subset=['lat', 'long'], axis=0)
         num_ungeotagged_rows = num_rows - len(dataframe)
@@ -136,9 +351,11 @@ class NBNatlasOccurrences(GeoData):
         num_rows = len(dataframe)
 
         # Drop any rows that contain the license type CC-BY-NC (Change requested by Catherine after dicussion with NBN Atlas)
-        dataframe = dataframe[dataframe["license"].str.fullmatch("CC-BY-NC")==False]
+        dataframe = dataframe[dataframe["license"].notna() 
+                              & ~dataframe["license"].isin(NBNatlasOccurrences.exclude_licences)]
         num_commercial_license_rows = num_rows - len(dataframe)
-        print(f'{num_commercial_license_rows} occurrence(s) removed containing CC-BY-NC license.')
+        print(f'{num_commercial_license_rows} occurrence(s) removed containing ' \
+              f'{", ".join(NBNatlasOccurrences.exclude_licences)} license.')
         dataframe = dataframe.reset_index(drop=True)        
         num_rows = len(dataframe)
         
@@ -268,21 +485,7 @@ class NBNatlasOccurrences(GeoData):
 
         print(f'\nDetermining catchments using sjoin()...\n')
 
-        # Set filepath - this could be a class variable or it could be downloaded
-        caba_data_shapefile = '\\CaBA_Partnership_boundaries\\CaBA_Partnership_boundaries.shp'
-        fp = self.user.working_dir + caba_data_shapefile
-
-        # Construct a geodataframe from catchment data: read file using geopandas.read_file()
-        gdf_caba = geopandas.read_file(fp)
-
-        # Convert from coord reference system EPSG:27700 (OSGB) to ESPG:4326 (WGS84)
-        gdf_caba = gdf_caba.to_crs(epsg=4326)
-
-        # Round lat-long to 6 d.p. NB taken from somewhere online!
-        simpledec = re.compile(r"\d*\.\d+")
-        def mround(match):
-            return "{:.6f}".format(float(match.group()))
-        gdf_caba.geometry = gdf_caba.geometry.apply(lambda x: loads(re.sub(simpledec, mround, x.wkt)))
+        gdf_caba = self.get_caba_boundaries() # Loaded once, see GeoData
 
         # Construct a geodataframe from self.dataframe. NB EPSG:4326 is WGS84:
         
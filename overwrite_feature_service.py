@@ -133,6 +133,7 @@ def overwrite_f_service(args):
    
 #    raise SystemExit()
     geodata_obj.get_data()  
+    GeoData.print_http_stats()
     geodata_obj.process_data()
     geodata_obj.create_geojson_file()
     #raise SystemExit()
@@ -0,0 +1,583 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import argparse
+import base64
+import csv
+import email.utils
+import functools
+import hashlib
+import http.server
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+
+
+# Related third party imports
+
+
+# Local application imports
+
+
+'''
+A local stand-in for the web services FLUTR gets its data from, so that get_data()
+ can be run, and fetcher throughput and concurrency changes benchmarked
+ reproducibly, on a machine with no network. It serves the endpoints:
+    /water-quality/id/sampling-point        (_limit, _offset, area, subArea)
+    /water-quality/data/sample.json         (samplingPoint, _limit)
+    /water-quality/batch/measurement        (year, area, subArea; a csv of the year's measurements)
+    /hydrology/id/stations                  (observedProperty, _limit, _offset)
+    /occurrences/search                     (q, fq, fl, pageSize, startIndex)
+    /ecology/explorer/downloads/<name>.zip  (ETag/If-None-Match, Range/If-Range)
+ Responses are recorded ones, if a recording of the request exists (see 'record'
+ below), otherwise synthetic ones generated from a seed, so are the same from run
+ to run. The size of the synthetic data sets can be scaled, and latency and
+ failures injected.
+
+Usage:
+python replay_server.py serve [--port 8000] [--scale 1.0] [--latency 0.05] ...
+    then, in another command prompt,
+set FLUTR_REPLAY_URL=http://localhost:8000
+python create_feature_service.py ...
+
+python replay_server.py record <url> [<url> ...] [--recordings replay_recordings]
+    Gets each <url> from the live service and saves the response for serving later
+
+python replay_server.py bench <datasource> <dataobject> [--scale 1.0] [--latency 0.05] ...
+    Starts a server, times <dataobject>.get_data() against it and prints statistics
+'''
+
+
+class ReplayData:
+    ''' Generates, and caches, the synthetic responses. Base sizes are roughly those
+         of the live services at the time of writing, multiplied by scale. '''
+
+    # Define class attributes:
+    num_sampling_points = 61228
+    num_stations = 1500
+    num_occurrences = 20000 # Per species, varied by up to a factor of two either way
+    mean_samples_per_point = 40
+    num_fish_rows = 200000
+    num_biosys_sites = 20000
+    sampling_point_groups = 'AZFBMDEPNCRYUSVTW'
+    areas = ['1-1', '1-2', '2-3', '2-4', '3-34', '4-6', '5-7', '6-8', '7-9', '8-10']
+    licences = ['OGL', 'CC0', 'CC-BY', 'CC-BY-NC']
+    # Index field names, as used in fq and fl, of the occurrence fields that differ
+    occurrence_fields = {'id': 'uuid',
+                         'occurrence_status': 'occurrenceStatus',
+                         'data_provider': 'dataProviderName',
+                         'latitude': 'decimalLatitude',
+                         'longitude': 'decimalLongitude',
+                         'coordinate_uncertainty': 'coordinateUncertaintyInMeters',
+                         'grid_reference': 'gridReference',
+                         'identification_verification_status': 'identificationVerificationStatus',
+                         'location_id': 'locationId',
+                         'taxon_name': 'scientificName',
+                         'common_name': 'vernacularName',
+                         'last_load_date': 'lastLoadDate'}
+    purposes = ['PLANNED', 'UNPLANNED', 'COMPLIANCE AUDIT (PERMIT)', 'MONITORING (NATIONAL AGENCY POLICY)']
+    download_members = {
+        'FW_Fish_Counts.zip': ['FW_Fish_Counts.csv'],
+        'INV_OPEN_DATA.zip': ['INV_OPEN_DATA_SITE.csv', 'INV_OPEN_DATA_METRICS.csv'],
+        'MACP_OPEN_DATA.zip': ['MACP_OPEN_DATA_SITE.csv', 'MACP_OPEN_DATA_METRICS.csv'],
+        'DIAT_OPEN_DATA.zip': ['DIAT_OPEN_DATA_SITE.csv', 'DIAT_OPEN_DATA_METRICS.csv']}
+
+
+    def __init__(self, seed, scale):
+        self.seed = seed
+        self.scale = scale
+        self.lock = threading.Lock()
+        self.downloads = {} # name: (bytes, sha256 digest), built on first request
+        # A few synthetic occurrences are 'loaded' when the server starts, so that an 
+        #  incremental sync has something to get
+        self.loaded = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+    def rng(self, key):
+        # A random number generator which gives the same sequence for <key> every run
+        return random.Random(f'{self.seed}:{key}')
+
+
+    def scaled(self, num):
+        return max(1, int(num * self.scale))
+
+
+    @functools.lru_cache(maxsize=None)
+    def sampling_points(self, area, sub_area=''):
+        rng = self.rng('sampling-point')
+        base = 'http://environment.data.gov.uk/water-quality'
+        items = []
+        for index in range(self.scaled(ReplayData.num_sampling_points)):
+            notation = f'SP-{index:06d}'
+            point_area = ReplayData.areas[index % len(ReplayData.areas)]
+            group = rng.choice(ReplayData.sampling_point_groups)
+            items.append({
+                '@id': f'{base}/id/sampling-point/{notation}',
+                'area': {'@id': f'{base}/id/ea-area/{point_area}', 'label': f'Area {point_area}'},
+                'comment': '',
+                'label': f'SAMPLING POINT {index}',
+                'lat': round(rng.uniform(50.0, 55.8), 6),
+                'long': round(rng.uniform(-5.7, 1.7), 6),
+                'notation': notation,
+                'samplingPointStatus': {'@id': f'{base}/def/sampling-point-status/O', 'label': rng.choice(['open', 'closed'])},
+                'samplingPointType': {'@id': f'{base}/def/sampling-point-types/{group}1',
+                                      'label': f'TYPE {group}',
+                                      'group': f'{base}/def/sampling-point-type-groups/{group}'},
+                'subArea': {'@id': f'{base}/id/ea-subarea/{point_area}-{index % 4}', 'label': f'Sub-area {index % 4}'}})
+        if area:
+            items = [item for item in items if item['area']['@id'].endswith('/' + area)]
+        if sub_area:
+            items = [item for item in items if item['subArea']['@id'].endswith('/' + sub_area)]
+        return items
+
+
+    def samples(self, sampling_point, limit):
+        rng = self.rng('sample:' + sampling_point)
+        base = 'http://environment.data.gov.uk/water-quality'
+        num_samples = rng.randint(1, 2 * ReplayData.mean_samples_per_point)
+        items = []
+        for index in range(min(num_samples, limit)):
+            purpose = rng.choice(ReplayData.purposes)
+            items.append({
+                '@id': f'{base}/data/sample/{sampling_point}-{index}',
+                'samplingPoint': {'@id': f'{base}/id/sampling-point/{sampling_point}', 'notation': sampling_point},
+                'sampleDateTime': f'{rng.randint(2000, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(7, 17):02d}:00:00',
+                'purpose': {'@id': f'{base}/def/purposes/{purpose[:2]}', 'label': purpose},
+                'isComplianceSample': rng.random() < 0.5})
+        return items
+
+
+    @functools.lru_cache(maxsize=None)
+    def stations(self, observed_property):
+        rng = self.rng('stations:' + observed_property)
+        base = 'http://environment.data.gov.uk/hydrology'
+        items = []
+        for index in range(self.scaled(ReplayData.num_stations)):
+            notation = hashlib.md5(f'{observed_property}{index}'.encode()).hexdigest()
+            item = {
+                '@id': f'{base}/id/stations/{notation}',
+                'label': f'STATION {index}',
+                'lat': round(rng.uniform(50.0, 55.8), 6),
+                'long': round(rng.uniform(-5.7, 1.7), 6),
+                'notation': notation,
+                'riverName': f'River {index % 300}',
+                'dateOpened': f'{rng.randint(1950, 2020)}-01-01',
+                'observedProperty': [{'@id': f'http://environment.data.gov.uk/reference/def/op/{observed_property}'}],
+                'status': {'@id': 'http://environment.data.gov.uk/reference/def/core/statusActive', 'label': 'Active'}}
+            if rng.random() < 0.1:
+                item['dateClosed'] = f'{rng.randint(2020, 2023)}-06-30'
+            items.append(item)
+        return items
+
+
+    @functools.lru_cache(maxsize=64)
+    def occurrences(self, q):
+        rng = self.rng('occurrences:' + q)
+        num_occurrences = self.scaled(ReplayData.num_occurrences * rng.uniform(0.5, 2.0))
+        occurrences = []
+        for index in range(num_occurrences):
+            lat = round(rng.uniform(50.0, 55.8), 5)
+            long = round(rng.uniform(-5.7, 1.7), 5)
+            occurrence = {
+                'uuid': hashlib.md5(f'{q}{index}'.encode()).hexdigest(),
+                'occurrenceStatus': 'present',
+                'dataProviderName': f'Provider {index % 40}',
+                'decimalLatitude': lat,
+                'decimalLongitude': long,
+                'coordinateUncertaintyInMeters': rng.choice([1.0, 10.0, 100.0, 1000.0, 2000.0, 10000.0]),
+                'gridReference': f'SU{rng.randint(0, 99):02d}{rng.randint(0, 99):02d}',
+                'identificationVerificationStatus': rng.choice(['Accepted', 'Accepted - considered correct', 'Unconfirmed']),
+                'license': rng.choice(ReplayData.licences),
+                'locationId': f'LOC{index % 5000:05d}',
+                'scientificName': q.strip('"'),
+                'vernacularName': q.strip('"'),
+                'month': f'{rng.randint(1, 12):02d}',
+                'year': rng.randint(1980, 2023),
+                'lastLoadDate': self.loaded if rng.random() < 0.02 else 
+                    f'{rng.randint(2015, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z'}
+            if rng.random() < 0.05:
+                del occurrence['coordinateUncertaintyInMeters']
+            occurrences.append(occurrence)
+        return occurrences
+
+
+    def filter_occurrences(self, occurrences, filter_queries):
+        # Apply the forms of fq used by NBNatlasOccurrences to <occurrences>
+        for filter_query in filter_queries:
+            (exclude, field, value) = re.fullmatch(r'(-?)(\w+):(.*)', filter_query).groups()
+            field = ReplayData.occurrence_fields.get(field, field)
+            range_query = re.fullmatch(r'\[(\S+) TO (\S+)\]', value)
+            if range_query:
+                (low, high) = range_query.groups()
+                matches = lambda occurrence: field in occurrence \
+                    and (low == '*' or str(occurrence[field]) >= low) \
+                    and (high == '*' or str(occurrence[field]) <= high)
+            else:
+                matches = lambda occurrence: str(occurrence.get(field)) == value.strip('"')
+            occurrences = [occurrence for occurrence in occurrences 
+                           if matches(occurrence) != bool(exclude)]
+        return occurrences
+
+
+    def download(self, name):
+        # Return the bytes and sha256 digest of the synthetic archive <name>
+        with self.lock:
+            if name not in self.downloads:
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                    for member in ReplayData.download_members[name]:
+                        archive.writestr(member, self.download_member(member))
+                content = buffer.getvalue()
+                self.downloads[name] = (content, hashlib.sha256(content).digest())
+            return self.downloads[name]
+
+
+    def measurements(self, year, area, sub_area=''):
+        ''' Return the bytes and sha256 digest of the csv of measurements in <year>, 
+             as in the bulk archives; the same samples as sample.json, each with a 
+             measurement of a couple of determinands. '''
+        name = f'measurement?area={area}&subArea={sub_area}&year={year}'
+        with self.lock:
+            if name in self.downloads:
+                return self.downloads[name]
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['@id', 'sample.samplingPoint', 'sample.samplingPoint.notation',
+                         'sample.samplingPoint.label', 'sample.sampleDateTime', 'determinand.label',
+                         'determinand.notation', 'result', 'determinand.unit.label',
+                         'sample.sampledMaterialType.label', 'sample.isComplianceSample',
+                         'sample.purpose.label'])
+        for point in self.sampling_points(area, sub_area):
+            for sample in self.samples(point['notation'], 10000):
+                if not sample['sampleDateTime'].startswith(year):
+                    continue
+                for (index, (determinand, unit)) in enumerate([('pH', 'phunits'), ('Temp Water', 'cel')]):
+                    writer.writerow([f"{sample['@id']}-{index:04d}".replace('/sample/', '/measurement/'),
+                                     point['@id'], point['notation'], point['label'],
+                                     sample['sampleDateTime'], determinand, f'{index + 61:04d}',
+                                     7.5 + index * 5, unit, 'RIVER / RUNNING SURFACE WATER',
+                                     str(sample['isComplianceSample']).lower(), sample['purpose']['label']])
+        content = output.getvalue().encode()
+
+        with self.lock:
+            self.downloads[name] = (content, hashlib.sha256(content).digest())
+            return self.downloads[name]
+
+
+    def download_member(self, member):
+        rng = self.rng('download:' + member)
+        output = io.StringIO()
+        writer = csv.writer(output)
+        if member == 'FW_Fish_Counts.csv':
+            num_sites = self.scaled(ReplayData.num_fish_rows // 20)
+            writer.writerow(['SITE_ID', 'SITE_NAME', 'EVENT_DATE', 'SURVEY_ID', 'SURVEY_METHOD',
+                             'SURVEY_STRATEGY', 'SURVEY_RANKED_EASTING', 'SURVEY_RANKED_NORTHING',
+                             'SPECIES_NAME', 'ALL_RUNS'])
+            for index in range(self.scaled(ReplayData.num_fish_rows)):
+                site = rng.randrange(num_sites)
+                writer.writerow([site, f'Site {site}',
+                                 f'{rng.randint(1975, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                                 index // 10, 'Electric fishing', 'Catch depletion sampling',
+                                 400000 + site, 200000 + site, rng.choice(['Brown trout', 'Bullhead', 'Eel']),
+                                 rng.randint(0, 50)])
+        elif member.endswith('_SITE.csv'):
+            writer.writerow(['WATER_BODY', 'SITE_ID', 'FULL_EASTING', 'FULL_NORTHING',
+                             'COUNT_OF_SAMPLES', 'MIN_SAMPLE_DATE', 'MAX_SAMPLE_DATE'])
+            for site in range(self.scaled(ReplayData.num_biosys_sites)):
+                first = rng.randint(1990, 2023)
+                writer.writerow([f'Water body {site % 3000}', site, rng.randint(100000, 650000),
+                                 rng.randint(10000, 650000), rng.randint(1, 100),
+                                 f'{first}-04-01', f'{rng.randint(first, 2023)}-10-01'])
+        else: # _METRICS.csv
+            writer.writerow(['SITE_ID', 'SAMPLE_ID', 'SAMPLE_DATE', 'SAMPLE_TYPE', 'SAMPLE_TYPE_DESCRIPTION',
+                             'SAMPLE_METHOD', 'SAMPLE_METHOD_DESCRIPTION', 'SAMPLE_REASON', 'ANALYSIS_ID',
+                             'DATE_OF_ANALYSIS', 'ANALYSIS_TYPE', 'ANALYSIS_TYPE_DESCRIPTION',
+                             'ANALYSIS_METHOD', 'ANALYSIS_METHOD_DESCRIPTION'])
+            for index in range(self.scaled(ReplayData.num_biosys_sites * 3)):
+                date = f'{rng.randint(1990, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+                writer.writerow([index // 3, index, date, 'S1', 'Sample type 1', 'M1', 'Sample method 1',
+                                 'Routine', index, date, 'A1', 'Analysis type 1', 'AM1', 'Analysis method 1'])
+        return output.getvalue()
+
+
+class ReplayRequestHandler(http.server.BaseHTTPRequestHandler):
+    ''' Serves one request using the options, data and statistics held by the server '''
+
+    protocol_version = 'HTTP/1.1' # Keep connections alive, as the live services do
+
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+
+    def do_GET(self):
+        options = self.server.options
+        parts = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        self.server.count('requests')
+
+        time.sleep(options.latency + random.uniform(0, options.jitter))
+        if random.random() < options.failure_rate:
+            self.server.count('failures injected')
+            self.send_body(503, b'{"error": "Injected failure"}', 'application/json',
+                           {'Retry-After': '1'})
+            return
+
+        recording = self.server.recording(self.path)
+        if recording is not None:
+            self.send_body(recording['status'], recording['body'], recording['content_type'])
+            return
+
+        data = self.server.data
+        if parts.path.endswith('/water-quality/id/sampling-point'):
+            items = data.sampling_points(query.get('area', ''), query.get('subArea', ''))
+            self.send_items(items, query)
+        elif parts.path.endswith('/water-quality/data/sample.json'):
+            items = data.samples(query.get('samplingPoint', ''), int(query.get('_limit', 10000)))
+            self.send_json({'meta': {}, 'items': items})
+        elif parts.path.endswith('/hydrology/id/stations'):
+            items = data.stations(query.get('observedProperty', 'waterFlow'))
+            self.send_items(items, query)
+        elif parts.path.endswith('/occurrences/search'):
+            occurrences = data.filter_occurrences(
+                data.occurrences(query.get('q', '')), 
+                urllib.parse.parse_qs(parts.query).get('fq', []))
+            page_size = int(query.get('pageSize', 10))
+            start_index = int(query.get('startIndex', 0))
+            page = occurrences[start_index:start_index + page_size]
+            if 'fl' in query:
+                fields = [ReplayData.occurrence_fields.get(field, field) 
+                          for field in query['fl'].split(',')]
+                page = [{field: occurrence[field] for field in fields if field in occurrence} 
+                        for occurrence in page]
+            self.send_json({'pageSize': page_size,
+                            'startIndex': start_index,
+                            'totalRecords': len(occurrences),
+                            'occurrences': page})
+        elif parts.path.endswith('/water-quality/batch/measurement'):
+            self.send_download(data.measurements(query.get('year', ''), query.get('area', ''),
+                                                 query.get('subArea', '')), 'text/csv')
+        elif os.path.basename(parts.path) in ReplayData.download_members:
+            self.send_download(data.download(os.path.basename(parts.path)), 'application/zip')
+        else:
+            self.send_body(404, b'{"error": "Not found"}', 'application/json')
+
+
+    def send_items(self, items, query):
+        # Send one page of <items> as selected by the _limit and _offset parameters
+        offset = int(query.get('_offset', 0))
+        limit = int(query.get('_limit', 10))
+        self.send_json({'meta': {'limit': limit, 'offset': offset},
+                        'items': items[offset:offset + limit]})
+
+
+    def send_json(self, content):
+        self.send_body(200, json.dumps(content).encode(), 'application/json')
+
+
+    def send_body(self, status, body, content_type, headers={}):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count('bytes sent', len(body))
+
+
+    def send_download(self, download, content_type):
+        ''' Send <download>, the bytes and sha256 digest of a file, honouring conditional
+             (If-None-Match) and range (Range/If-Range) requests. Downloads may be 
+             truncated part way through, to exercise resuming. '''
+        (content, digest) = download
+        etag = '"' + digest.hex()[:32] + '"'
+        headers = {'ETag': etag,
+                   'Last-Modified': self.server.started,
+                   'Accept-Ranges': 'bytes',
+                   'Digest': 'sha-256=' + base64.b64encode(digest).decode()}
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            for (name, value) in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        status = 200
+        start = 0
+        end = len(content) - 1
+        requested = self.headers.get('Range', '')
+        if requested.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+            (first, _, last) = requested[len('bytes='):].partition('-')
+            start = int(first)
+            end = min(int(last), end) if last else end
+            if start > end:
+                self.send_body(416, b'', 'text/plain', {'Content-Range': f'bytes */{len(content)}'})
+                return
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(content)}'
+
+        body = content[start:end + 1]
+        if random.random() < self.server.options.truncate_rate:
+            self.server.count('truncations injected')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for (name, value) in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.server.count('bytes sent', len(body) // 2)
+            self.close_connection = True
+            return
+        self.send_body(status, body, content_type, headers)
+
+
+class ReplayServer(http.server.ThreadingHTTPServer):
+
+    daemon_threads = True
+
+
+    def __init__(self, options):
+        super().__init__(('127.0.0.1', options.port), ReplayRequestHandler)
+        self.options = options
+        self.data = ReplayData(options.seed, options.scale)
+        self.started = email.utils.formatdate(usegmt=True)
+        self.stats = {'requests': 0, 'bytes sent': 0, 'failures injected': 0, 'truncations injected': 0}
+        self.stats_lock = threading.Lock()
+        random.seed(options.seed) # So that injected latency and failures are repeatable
+
+
+    def count(self, stat, increment=1):
+        with self.stats_lock:
+            self.stats[stat] += increment
+
+
+    def recording(self, path):
+        # Return the recorded response to <path>, if there is one
+        recording_file = recording_filename(self.options.recordings, path)
+        if not os.path.isfile(recording_file):
+            return None
+        with open(recording_file, 'r') as input_file:
+            recording = json.load(input_file)
+        recording['body'] = base64.b64decode(recording['body'])
+        return recording
+
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+def recording_filename(recordings, path):
+    # Recordings are keyed on path and query, since the host is replaced by the replay server
+    return os.path.join(recordings, hashlib.sha1(path.encode()).hexdigest() + '.json')
+
+
+def record(options):
+    import requests
+
+    os.makedirs(options.recordings, exist_ok=True)
+    for url in options.urls:
+        print(f'\nRecording {url}')
+        response = requests.get(url)
+        parts = urllib.parse.urlsplit(url)
+        path = urllib.parse.urlunsplit(('', '', parts.path, parts.query, ''))
+        with open(recording_filename(options.recordings, path), 'w') as output_file:
+            json.dump({'url': url,
+                       'status': response.status_code,
+                       'content_type': response.headers.get('Content-Type', ''),
+                       'body': base64.b64encode(response.content).decode()}, output_file)
+        print(f'Recorded {len(response.content)} bytes, status {response.status_code}')
+
+
+def serve(options):
+    server = ReplayServer(options)
+    print(f'\nReplay server listening at {server.url}')
+    print(f'Set FLUTR_REPLAY_URL={server.url} to direct FLUTR to it. Ctrl+C to stop.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    print(f'\n{server.stats}')
+
+
+def bench(options):
+    from agol_user import LocalUser
+    from create_feature_service import Arguments, create_geodata_obj
+    from geo_data import GeoData
+
+    options.port = 0 # Any free port
+    server = ReplayServer(options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    GeoData.replay_url = server.url
+
+    # Start from an empty working directory, unless told otherwise, so runs are comparable
+    working_dir = options.working_dir or tempfile.mkdtemp(prefix='flutr_bench_')
+    user_obj = LocalUser(working_dir)
+    geodata_obj = create_geodata_obj(
+        Arguments(options.datasource, options.dataobject, '', ''), user_obj)
+
+    start = time.perf_counter()
+    geodata_obj.get_data()
+    runtime = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    print(f'\nget_data() for {geodata_obj.name} took {runtime:.2f} seconds')
+    print(f"{server.stats['requests']} requests ({server.stats['requests'] / runtime:.1f}/s), " \
+          f"{server.stats['bytes sent'] / 1024**2:.1f} MB ({server.stats['bytes sent'] / 1024**2 / runtime:.1f} MB/s), " \
+          f"{server.stats['failures injected']} failures and " \
+          f"{server.stats['truncations injected']} truncations injected")
+    GeoData.print_http_stats()
+    print(f'Working directory: {working_dir}')
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(description='Offline stand-in for the EA and NBN Atlas web services')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Serve until stopped')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    bench_parser = subparsers.add_parser('bench', help='Time get_data() against a replay server')
+    bench_parser.add_argument('datasource')
+    bench_parser.add_argument('dataobject')
+    bench_parser.add_argument('--working-dir', default='', help='Defaults to a new, empty, temporary folder')
+    for subparser in (serve_parser, bench_parser):
+        subparser.add_argument('--scale', type=float, default=1.0, help='Multiplies the size of synthetic data sets')
+        subparser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response')
+        subparser.add_argument('--jitter', type=float, default=0.0, help='Up to this many seconds more, at random')
+        subparser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered 503')
+        subparser.add_argument('--truncate-rate', type=float, default=0.0, help='Fraction of downloads cut off half way')
+        subparser.add_argument('--seed', type=int, default=0)
+        subparser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    record_parser = subparsers.add_parser('record', help='Save live responses for serving later')
+    record_parser.add_argument('urls', nargs='+')
+    for subparser in (serve_parser, bench_parser, record_parser):
+        subparser.add_argument('--recordings', default='replay_recordings', help='Folder of recorded responses')
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    options = get_arguments()
+    if options.command == 'serve':
+        serve(options)
+    elif options.command == 'record':
+        record(options)
+    else:
+        bench(options)
+
+
+if __name__ == "__main__":
+    main()
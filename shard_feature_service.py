@@ -0,0 +1,129 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import sys
+import time
+
+# Related third party imports
+
+# Local application imports
+from agol_user import AGOLUser, LocalUser
+from create_feature_service import Arguments, create_geodata_obj
+from geo_data import GeoData
+
+
+'''
+Splits a water quality sample history run into shards, one for each EA area (or 
+ subArea), which can be run at once on separate machines or processes, then merges 
+ their partial results and publishes or overwrites the feature layer as 
+ create_feature_service.py or overwrite_feature_service.py would.
+Shards write their partial results to the folder shards, in a folder named after the
+ item, in the working directory. So either run them all in one (e.g. shared network)
+ working directory, or copy their results into the working directory of the merge.
+
+python shard_feature_service.py plan EA_water_qual_archives sampling_history [area|subArea]
+    Lists the shards, and saves the plan, which the merge checks is complete
+python shard_feature_service.py run EA_water_qual_archives sampling_history area=3-34
+    Runs one shard of the plan. No ArcGIS Online login needed
+python shard_feature_service.py merge EA_water_qual_archives sampling_history <username> <password> [<itemid>]
+    Merges the shards, determines CaBA catchments and publishes a new feature layer,
+     or overwrites the feature layer <itemid>
+'''
+
+
+USAGE = f"Usage: python {sys.argv[0]} plan <datasource> <dataobject> [area|subArea]\n" \
+        f"       python {sys.argv[0]} run <datasource> <dataobject> <shard>\n" \
+        f"       python {sys.argv[0]} merge <datasource> <dataobject> <username> <password> [<itemid>]"
+valid_sharded_dataobject = ["sampling_history", "sampling_history_2", "sampling_history_3", "sampling_history_1_yorkshire", "sampling_history_2_yorkshire"]
+valid_shard_by = ["area", "subArea"]
+
+
+def validate(args):
+    if len(args) < 3 or args[0] not in ["plan", "run", "merge"]:
+        raise SystemExit(USAGE)
+    (command, datasource, dataobject) = args[:3]
+    print(f"\nData source: {datasource}\nData object: {dataobject}")
+
+    if datasource != "EA_water_qual_archives" or dataobject not in valid_sharded_dataobject:
+        print(f"Only EA_water_qual_archives data objects can be sharded. Must be one of:\n{valid_sharded_dataobject}.")
+        raise SystemExit(USAGE)
+    if command == "plan" and (len(args) > 4 or args[3:] and args[3] not in valid_shard_by):
+        print(f"Shards must be by one of:\n{valid_shard_by}.")
+        raise SystemExit(USAGE)
+    if command == "run" and (len(args) != 4 or args[3].split("=")[0] not in valid_shard_by):
+        print("Shard must be one listed by plan, e.g. area=3-34")
+        raise SystemExit(USAGE)
+    if command == "merge" and len(args) not in [5, 6]:
+        print("Incorrect number of arguments.")
+        raise SystemExit(USAGE)
+
+    return (command, Arguments(datasource, dataobject, "", ""), args[3:])
+
+
+def plan(args, by="area"):
+    geodata_obj = create_geodata_obj(args, LocalUser())
+    shards = geodata_obj.plan_shards(by)
+
+    print("\nRun each shard, on any machine, with:")
+    for shard in shards:
+        print(f"python {sys.argv[0]} run {args.datasource} {args.dataobject} {shard}")
+
+
+def run(args, shard):
+    geodata_obj = create_geodata_obj(args, LocalUser())
+    geodata_obj.sites_filter = shard
+
+    geodata_obj.get_data()
+    GeoData.print_http_stats()
+    geodata_obj.prepare_data()
+    geodata_obj.save_partial()
+
+
+def merge(args, username, password, itemid=""):
+    # Create AGOLUser object
+    user_obj = AGOLUser(username, password)
+    geodata_obj = create_geodata_obj(args, user_obj)
+    print(f"Object name: {geodata_obj.name}")
+
+    # As create_feature_service.py, or overwrite_feature_service.py if given <itemid>
+    geodata_obj.agol_f_layer_id = itemid
+    if itemid and geodata_obj.check_item_already_exists() == False:
+        print(f"\nNo ArcGIS Online item found with id '{itemid}'.")
+        raise SystemExit()
+    if not itemid and geodata_obj.check_item_already_exists() == True:
+        print("\nEither delete items or merge with the item id to overwrite instead")
+        raise SystemExit()
+
+    geodata_obj.load_partials()
+    geodata_obj.determine_catchment()
+    geodata_obj.create_geojson_file()
+    if itemid:
+        geodata_obj.overwrite_f_layer()
+    else:
+        geodata_obj.add_data_item()
+        geodata_obj.publish_f_layer()
+        geodata_obj.publish_f_layer_view()
+
+    print("\nDone!\n")
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if not args:
+        raise SystemExit(USAGE)
+
+    # Validate the arguments passed at the command line
+    (command, validated_args, rest) = validate(args)
+
+    if command == "plan":
+        plan(validated_args, *rest)
+    elif command == "run":
+        run(validated_args, *rest)
+    else:
+        merge(validated_args, *rest)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    runtime = round((end - start) / 60, 2)
+    print(f"Function took {runtime} minutes to run.")
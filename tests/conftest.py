@@ -0,0 +1,63 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import os
+import sys
+
+
+# Related third party imports
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+# The modules are at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeResponse:
+    ''' Stands in for a streamed requests.Response. If <fail_after> is set, the
+         connection drops after that many bytes of <body>. '''
+
+    def __init__(self, status_code, body=b'', headers=None, fail_after=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.fail_after = fail_after
+
+
+    def iter_content(self, chunk_size=1):
+        end = len(self.body) if self.fail_after is None else self.fail_after
+        for start in range(0, end, chunk_size):
+            yield self.body[start:min(start + chunk_size, end)]
+        if self.fail_after is not None:
+            raise requests.exceptions.ConnectionError('Connection dropped')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    ''' Replace GeoData.http_get with one that returns the FakeResponses appended to
+         the returned list, in turn, recording each request's url and headers in its
+         'requests' attribute. '''
+    geo_data = pytest.importorskip('geo_data')
+
+    class Responses(list):
+        pass
+
+    responses = Responses()
+    responses.requests = []
+
+    def http_get(url, **kwargs):
+        responses.requests.append((url, dict(kwargs.get('headers') or {})))
+        return responses.pop(0)
+
+    monkeypatch.setattr(geo_data.GeoData, 'http_get', staticmethod(http_get))
+    monkeypatch.setattr(geo_data.GeoData, 'http_backoff', 0)
+    monkeypatch.setattr(geo_data.GeoData, 'archive_cache', None)
+    return responses
@@ -0,0 +1,157 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import hashlib
+import io
+import os
+import time
+import types
+import zipfile
+
+
+# Related third party imports
+import pytest
+
+
+# Local application imports
+from archive_cache import ArchiveCache
+from conftest import FakeResponse
+
+
+def store(cache, tmp_path, url, content, headers=None):
+    downloaded = tmp_path / 'download.tmp'
+    downloaded.write_bytes(content)
+    entry = cache.store(url, str(downloaded), headers or {}, hashlib.sha256(content).hexdigest())
+    return cache.archive_path(entry)
+
+
+def test_store_records_validators(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 1000, 60)
+    path = store(cache, tmp_path, 'http://example.com/a.zip', b'abc',
+                 {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+    entry = cache.get('http://example.com/a.zip')
+    assert cache.archive_path(entry) == path
+    assert open(path, 'rb').read() == b'abc'
+    assert cache.validators('http://example.com/a.zip') == \
+        {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert cache.validators('http://example.com/b.zip') == {}
+
+    # The index is kept between runs
+    assert ArchiveCache(str(tmp_path / 'cache'), 1000, 60).get('http://example.com/a.zip') == entry
+
+
+def test_identical_archives_stored_once(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 1000, 60)
+    first = store(cache, tmp_path, 'http://example.com/a.zip', b'same')
+    second = store(cache, tmp_path, 'http://mirror.example.com/a.zip', b'same')
+    assert first == second
+    assert len(cache.index['archives']) == 1
+    assert not os.path.exists(tmp_path / 'download.tmp')
+
+
+def test_entry_missing_from_disk(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 1000, 60)
+    os.remove(store(cache, tmp_path, 'http://example.com/a.zip', b'abc'))
+    assert cache.get('http://example.com/a.zip') is None
+    assert cache.validators('http://example.com/a.zip') == {}
+
+
+def test_is_fresh(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 1000, 60)
+    assert cache.is_fresh({'checked': time.time() - 30})
+    assert not cache.is_fresh({'checked': time.time() - 90})
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 10, 60)
+    a = store(cache, tmp_path, 'http://example.com/a.zip', b'aaaa')
+    b = store(cache, tmp_path, 'http://example.com/b.zip', b'bbbb')
+    cache.index['archives'][hashlib.sha256(b'aaaa').hexdigest()]['last_used'] = time.time() + 1
+    store(cache, tmp_path, 'http://example.com/c.zip', b'cccc')
+
+    assert os.path.isfile(a)
+    assert not os.path.exists(b)
+    assert cache.get('http://example.com/b.zip') is None
+    assert 'http://example.com/b.zip' not in cache.index['urls']
+    assert cache.get('http://example.com/c.zip') is not None
+
+
+def test_newest_archive_kept_over_budget(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 2, 60)
+    store(cache, tmp_path, 'http://example.com/a.zip', b'aaaa')
+    store(cache, tmp_path, 'http://example.com/b.zip', b'bbbb')
+    assert cache.get('http://example.com/a.zip') is None
+    assert cache.get('http://example.com/b.zip') is not None
+
+
+def test_download_revalidated_with_etag(tmp_path, fake_http, monkeypatch):
+    geo_data = pytest.importorskip('geo_data')
+    monkeypatch.setattr(geo_data.GeoData, 'archive_cache_max_age', 0) # Always re-validate
+    data = geo_data.GeoData('EA', 'test', types.SimpleNamespace(working_dir=str(tmp_path)))
+    data.use_archive_cache = True
+
+    fake_http.append(FakeResponse(200, b'v1 data', {'ETag': '"v1"', 'Content-Length': '7'}))
+    first = data.download_archive('http://example.com/', 'data.csv')
+    assert open(first, 'rb').read() == b'v1 data'
+
+    # Not modified: the cached archive is used, and no new one stored
+    fake_http.append(FakeResponse(304))
+    assert data.download_archive('http://example.com/', 'data.csv') == first
+    assert fake_http.requests[-1][1]['If-None-Match'] == '"v1"'
+    assert len(data.get_archive_cache().index['archives']) == 1
+
+    # Modified: the new archive replaces it for this URL
+    fake_http.append(FakeResponse(200, b'v2 data!', {'ETag': '"v2"', 'Content-Length': '8'}))
+    second = data.download_archive('http://example.com/', 'data.csv')
+    assert open(second, 'rb').read() == b'v2 data!'
+    assert data.get_archive_cache().validators('http://example.com/data.csv')['If-None-Match'] == '"v2"'
+
+
+def test_fresh_download_not_revalidated(tmp_path, fake_http):
+    geo_data = pytest.importorskip('geo_data')
+    data = geo_data.GeoData('EA', 'test', types.SimpleNamespace(working_dir=str(tmp_path)))
+    data.use_archive_cache = True
+
+    fake_http.append(FakeResponse(200, b'v1 data', {'ETag': '"v1"'}))
+    first = data.download_archive('http://example.com/', 'data.csv')
+    assert data.download_archive('http://example.com/', 'data.csv') == first
+    assert len(fake_http.requests) == 1
+
+
+def test_derived_files_evicted_with_archive(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache'), 6, 60)
+    store(cache, tmp_path, 'http://example.com/a.zip', b'aaaa')
+    staging_dir = tmp_path / 'cache' / 'parquet_staging'
+    staging_dir.mkdir()
+    a_sha256 = hashlib.sha256(b'aaaa').hexdigest()
+    (staging_dir / f'{a_sha256}.Sites.parquet').write_bytes(b'a')
+    (staging_dir / f'{a_sha256}.Surveys.parquet').write_bytes(b'a')
+
+    store(cache, tmp_path, 'http://example.com/b.zip', b'bbbb')
+    b_sha256 = hashlib.sha256(b'bbbb').hexdigest()
+    (staging_dir / f'{b_sha256}.Sites.parquet').write_bytes(b'b')
+
+    assert cache.get('http://example.com/a.zip') is None
+    assert sorted(os.listdir(staging_dir)) == [f'{b_sha256}.Sites.parquet']
+
+
+def test_extracted_after_entry_evicted(tmp_path, fake_http, monkeypatch):
+    geo_data = pytest.importorskip('geo_data')
+    data = geo_data.GeoData('EA', 'test', types.SimpleNamespace(working_dir=str(tmp_path)))
+    data.use_archive_cache = True
+
+    # Another download evicts the URL from the index as soon as it is stored
+    real_store = ArchiveCache.store
+    def store_then_evict(cache, url, *args):
+        entry = real_store(cache, url, *args)
+        with cache.lock:
+            del cache.index['urls'][url]
+        return entry
+    monkeypatch.setattr(ArchiveCache, 'store', store_then_evict)
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('data.csv', 'v1')
+    fake_http.append(FakeResponse(200, buffer.getvalue()))
+    datafiles_path = data.download_and_extract('http://example.com/', 'data.zip')
+    # The path ends with a Windows separator
+    assert open(os.path.join(datafiles_path.rstrip('\\'), 'data.csv')).read() == 'v1'
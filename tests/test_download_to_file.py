@@ -0,0 +1,170 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import hashlib
+import json
+import os
+import types
+
+
+# Related third party imports
+import pytest
+
+
+# Local application imports
+from conftest import FakeResponse
+
+
+geo_data = pytest.importorskip('geo_data')
+GeoData = geo_data.GeoData
+
+BODY = bytes(range(256)) * 40
+URL = 'http://example.com/'
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    monkeypatch.setattr(GeoData, 'download_chunk_size', 1000)
+    return GeoData('EA', 'test', types.SimpleNamespace(working_dir=str(tmp_path)))
+
+
+def read(path):
+    with open(path, 'rb') as input_file:
+        return input_file.read()
+
+
+@pytest.mark.parametrize('content_range, expected', [
+    ('bytes 1000-1999/5000', (1000, 5000)),
+    (' bytes 0-0/1 ', (0, 1)),
+    ('bytes 1000-1999/*', (1000, -1)),
+    ('', (-1, -1)),
+    ('bytes */5000', (-1, -1)),
+    ('items 0-9/10', (-1, -1))])
+def test_parse_content_range(content_range, expected):
+    assert GeoData.parse_content_range(content_range) == expected
+
+
+def test_whole_download(data, fake_http):
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}))
+    (path, headers, sha256) = data.download_to_file(URL, 'data.csv')
+    assert read(path) == BODY
+    assert sha256 == hashlib.sha256(BODY).hexdigest()
+    assert fake_http.requests[0][1]['Accept-Encoding'] == 'identity'
+    assert not os.path.exists(os.path.join(data.user.working_dir, 'data.csv.part'))
+
+
+def test_not_modified(data, fake_http):
+    fake_http.append(FakeResponse(304))
+    (path, _, sha256) = data.download_to_file(URL, 'data.csv', headers={'If-None-Match': '"v1"'})
+    assert path is None and sha256 == ''
+    assert fake_http.requests[0][1]['If-None-Match'] == '"v1"'
+
+
+def test_resumed_after_connection_drops(data, fake_http):
+    headers = {'Content-Length': str(len(BODY)), 'ETag': '"v1"'}
+    fake_http.append(FakeResponse(200, BODY, headers, fail_after=3000))
+    fake_http.append(FakeResponse(206, BODY[3000:],
+                                  {'Content-Range': f'bytes 3000-{len(BODY) - 1}/{len(BODY)}'}))
+    (path, _, _) = data.download_to_file(URL, 'data.csv', headers={'If-None-Match': '"v0"'})
+    assert read(path) == BODY
+
+    resume_headers = fake_http.requests[1][1]
+    assert resume_headers['Range'] == 'bytes=3000-'
+    assert resume_headers['If-Range'] == '"v1"'
+    assert 'If-None-Match' not in resume_headers
+
+
+def test_resume_with_mismatched_range(data, fake_http):
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}, fail_after=3000))
+    fake_http.append(FakeResponse(206, BODY[2000:],
+                                  {'Content-Range': f'bytes 2000-{len(BODY) - 1}/{len(BODY)}'}))
+    with pytest.raises(SystemExit):
+        data.download_to_file(URL, 'data.csv')
+    # Nothing was appended at the wrong offset
+    assert read(os.path.join(data.user.working_dir, 'data.csv.part')) == BODY[:3000]
+
+
+def test_resume_rejected_restarts(data, fake_http):
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}, fail_after=3000))
+    fake_http.append(FakeResponse(416))
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}))
+    (path, _, _) = data.download_to_file(URL, 'data.csv')
+    assert read(path) == BODY
+    assert 'Range' not in fake_http.requests[2][1]
+
+
+def test_server_ignoring_range_starts_again(data, fake_http):
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}, fail_after=3000))
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}))
+    (path, _, _) = data.download_to_file(URL, 'data.csv')
+    assert read(path) == BODY
+
+
+def test_partial_file_from_earlier_run_resumed(data, fake_http):
+    partial_file = os.path.join(data.user.working_dir, 'data.csv.part')
+    with open(partial_file, 'wb') as output_file:
+        output_file.write(BODY[:5000])
+    with open(partial_file + '.json', 'w') as output_file:
+        json.dump({'url': URL + 'data.csv', 'etag': '"v1"', 'last_modified': '',
+                   'total': len(BODY)}, output_file)
+
+    fake_http.append(FakeResponse(206, BODY[5000:],
+                                  {'Content-Range': f'bytes 5000-{len(BODY) - 1}/{len(BODY)}'}))
+    (path, _, _) = data.download_to_file(URL, 'data.csv')
+    assert read(path) == BODY
+    assert fake_http.requests[0][1]['Range'] == 'bytes=5000-'
+
+
+def test_partial_file_of_another_url_discarded(data, fake_http):
+    partial_file = os.path.join(data.user.working_dir, 'data.csv.part')
+    with open(partial_file, 'wb') as output_file:
+        output_file.write(b'other')
+    with open(partial_file + '.json', 'w') as output_file:
+        json.dump({'url': 'http://elsewhere.example.com/data.csv'}, output_file)
+
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}))
+    (path, _, _) = data.download_to_file(URL, 'data.csv')
+    assert read(path) == BODY
+    assert 'Range' not in fake_http.requests[0][1]
+
+
+
+def test_partial_file_in_use_left_alone(data, fake_http, monkeypatch):
+    # Another download of data.csv is under way, part way through
+    partial_file = os.path.join(data.user.working_dir, 'data.csv.part')
+    with open(partial_file, 'wb') as output_file:
+        output_file.write(BODY[:5000])
+    with open(partial_file + '.json', 'w') as output_file:
+        json.dump({'url': URL + 'data.csv', 'etag': '', 'last_modified': '',
+                   'total': len(BODY)}, output_file)
+    lock = GeoData.lock_file(partial_file + '.lock')
+    try:
+        fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}))
+        (path, _, _) = data.download_to_file(URL, 'data.csv')
+        assert read(path) == BODY
+        assert 'Range' not in fake_http.requests[0][1]
+        assert read(partial_file) == BODY[:5000]
+
+        # Nor is a partial file of its own left behind if this one fails
+        monkeypatch.setattr(GeoData, 'download_attempts', 1)
+        fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}, fail_after=1000))
+        with pytest.raises(SystemExit):
+            data.download_to_file(URL, 'data.csv')
+        assert sorted(name for name in os.listdir(data.user.working_dir) if '.part' in name) == \
+            ['data.csv.part', 'data.csv.part.json', 'data.csv.part.lock']
+    finally:
+        lock.close()
+
+def test_gives_up_keeping_partial_file(data, fake_http, monkeypatch):
+    monkeypatch.setattr(GeoData, 'download_attempts', 2)
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY))}, fail_after=1000))
+    fake_http.append(FakeResponse(206, BODY[1000:],
+                                  {'Content-Range': f'bytes 1000-{len(BODY) - 1}/{len(BODY)}'},
+                                  fail_after=1000))
+    with pytest.raises(SystemExit):
+        data.download_to_file(URL, 'data.csv')
+    assert read(os.path.join(data.user.working_dir, 'data.csv.part')) == BODY[:2000]
+
+
+def test_wrong_size_fails_verification(data, fake_http):
+    fake_http.append(FakeResponse(200, BODY, {'Content-Length': str(len(BODY) - 1)}))
+    with pytest.raises(SystemExit):
+        data.download_to_file(URL, 'data.csv')
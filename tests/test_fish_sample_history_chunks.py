@@ -0,0 +1,68 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+
+
+# Related third party imports
+import pandas
+import pytest
+
+
+# Local application imports
+
+
+ea_ecology_and_fish_data = pytest.importorskip('ea_ecology_and_fish_data')
+fish_history_2 = pytest.importorskip('ea_survey_sites_fish_sample_history_2')
+EASurveySitesFishHistory2 = fish_history_2.EASurveySitesFishHistory2
+
+# Sites spread over several chunks, with ties on the latest date, dates that can't
+#  be parsed, missing eastings and IDs with leading zeros
+FISH_COUNTS = '''SITE_ID,SITE_NAME,EVENT_DATE,SURVEY_RANKED_EASTING,SURVEY_RANKED_NORTHING,SPECIES
+001,Weir,2001-05-01,400000,300000,Trout
+002,Mill,2003-07-12,410000.5,310000,Chub
+001,Weir pool,2010-06-01,400010,300010,Trout
+003,Ford,not a date,420000,320000,Dace
+002,Mill race,2003-07-12,410001,310001,Chub
+004,Bridge,2005-01-01,,330000,Perch
+001,Weir,2004-05-01,400000,300000,Trout
+003,Ford,1999-09-09,420001,320001,Dace
+002,Mill,2003-07-12,410002,310002,Chub
+005,Lock,,430000,340000,Eel
+002,Mill,1998-01-01,410003,310003,Chub
+001,Weir top,2010-06-01,400020,300020,Trout
+005,Lock,garbage,430001,340001,Eel
+'''
+
+
+@pytest.fixture
+def fish_counts(tmp_path, monkeypatch):
+    monkeypatch.setattr(EASurveySitesFishHistory2, 'chunk_size', 3)
+    path = tmp_path / 'FW_Fish_Counts.csv'
+    path.write_text(FISH_COUNTS)
+    return str(path)
+
+
+@pytest.mark.parametrize('stage_parquet, use_pyarrow', [(True, True), (False, True), (False, False)])
+def test_chunked_same_as_whole_file(fish_counts, monkeypatch, stage_parquet, use_pyarrow):
+    monkeypatch.setattr(ea_ecology_and_fish_data.EAEcologyAndFishData, 'stage_parquet', stage_parquet)
+    if not use_pyarrow:
+        monkeypatch.setattr(ea_ecology_and_fish_data, 'pyarrow', None)
+
+    whole = EASurveySitesFishHistory2.construct_df(fish_counts)
+    chunked = EASurveySitesFishHistory2.construct_df_chunked(fish_counts)
+
+    # construct_df()'s categories include names from every row rather than just the latest
+    pandas.testing.assert_frame_equal(chunked, whole, check_categorical=False)
+
+
+def test_chunked_values(fish_counts):
+    chunked = EASurveySitesFishHistory2.construct_df_chunked(fish_counts).set_index('fish_site_id')
+
+    assert list(chunked.index) == ['001', '002', '003', '005'] # 004 has no easting
+    assert chunked.loc['001', 'fish_site_name'] == 'Weir pool' # First of the latest
+    assert chunked.loc['001', 'easting'] == 400010.0
+    assert chunked.loc['001', 'num_samples'] == 4
+    assert chunked.loc['001', 'first_fish_survey'] == '2001-05-01'
+    assert chunked.loc['002', 'fish_site_name'] == 'Mill'
+    assert chunked.loc['002', 'easting'] == 410000.5
+    assert pandas.isna(chunked.loc['003', 'first_fish_survey'])
+    assert chunked.loc['003', 'last_fish_survey'] == '1999-09-09'
+    assert pandas.isna(chunked.loc['005', 'last_fish_survey'])
@@ -0,0 +1,100 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import threading
+import urllib.parse
+
+
+# Related third party imports
+import pytest
+
+
+# Local application imports
+
+
+geo_data = pytest.importorskip('geo_data')
+GeoData = geo_data.GeoData
+
+
+class ItemsAPI:
+    ''' Stands in for an EA linked data API list of <num_items> items. The first
+         <num_bad> requests for each offset in <bad_offsets> come back with only
+         <bad_length> items. '''
+
+    def __init__(self, num_items, bad_offsets=(), num_bad=1, bad_length=0):
+        self.items = [{'@id': f'http://example.com/{number}', 'number': number}
+                      for number in range(num_items)]
+        self.bad = {offset: num_bad for offset in bad_offsets}
+        self.bad_length = bad_length
+        self.offsets = []
+        self.lock = threading.Lock()
+
+
+    def http_get_json_items(self, url, key, fields):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        (limit, offset) = (int(query['_limit'][0]), int(query['_offset'][0]))
+        items = self.items[offset:offset + limit]
+        with self.lock:
+            self.offsets.append(offset)
+            if self.bad.get(offset, 0) > 0:
+                self.bad[offset] -= 1
+                items = items[:self.bad_length]
+        return [{field: item[field] for field in fields if field in item} for item in items]
+
+
+@pytest.fixture
+def items_api(monkeypatch):
+    monkeypatch.setattr(GeoData, 'items_page_size', 10)
+    monkeypatch.setattr(GeoData, 'max_page_workers', 3)
+
+    def use(api):
+        monkeypatch.setattr(GeoData, 'http_get_json_items', staticmethod(api.http_get_json_items))
+        return api
+    return use
+
+
+@pytest.mark.parametrize('num_items', [0, 1, 10, 29, 30, 31, 100])
+def test_all_items_got(items_api, num_items):
+    items_api(ItemsAPI(num_items))
+    items = GeoData.get_all_items('http://example.com/items.json?area=1', ['number'])
+    assert [item['number'] for item in items] == list(range(num_items))
+    assert all('@id' not in item for item in items)
+
+
+@pytest.mark.parametrize('bad_length', [0, 5])
+def test_short_page_requested_again(items_api, bad_length):
+    # Pages at offsets 30 and 40 come back short, or empty, the first time
+    api = items_api(ItemsAPI(100, bad_offsets=[30, 40], bad_length=bad_length))
+    items = GeoData.get_all_items('http://example.com/items.json', ['@id', 'number'])
+    assert [item['number'] for item in items] == list(range(100))
+    assert api.offsets.count(30) == 2
+    assert '@id' in items[0]
+
+
+def test_short_page_that_stays_short_stops_the_run(items_api):
+    items_api(ItemsAPI(100, bad_offsets=[30], num_bad=GeoData.page_retries + 1, bad_length=5))
+    with pytest.raises(SystemExit):
+        GeoData.get_all_items('http://example.com/items.json', ['number'])
+
+
+def test_end_of_list_checked_once(items_api):
+    api = items_api(ItemsAPI(35))
+    GeoData.get_all_items('http://example.com/items.json', ['number'])
+    # The short last page and the empty one after it, then no more
+    assert api.offsets.count(30) == 2
+    assert api.offsets.count(40) == 2
+    assert max(api.offsets) == 50
+
+
+def test_empty_page_ending_a_wave_requested_again(items_api):
+    # Pages at offsets 30-50 are a wave, the last of which comes back empty, which
+    #  would otherwise end the list with every page before it full
+    items_api(ItemsAPI(100, bad_offsets=[50]))
+    items = GeoData.get_all_items('http://example.com/items.json', ['number'])
+    assert [item['number'] for item in items] == list(range(100))
+
+
+def test_short_last_page_requested_again(items_api):
+    api = items_api(ItemsAPI(35, bad_offsets=[30], bad_length=2))
+    items = GeoData.get_all_items('http://example.com/items.json', ['number'])
+    assert [item['number'] for item in items] == list(range(35))
+    assert api.offsets.count(30) == 3 # Until it stops growing
+
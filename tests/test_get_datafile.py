@@ -0,0 +1,58 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import io
+import os
+import types
+import zipfile
+
+
+# Related third party imports
+import pytest
+
+
+# Local application imports
+from conftest import FakeResponse
+
+
+ea_ecology_and_fish_data = pytest.importorskip('ea_ecology_and_fish_data')
+EAEcologyAndFishData = ea_ecology_and_fish_data.EAEcologyAndFishData
+
+
+@pytest.fixture
+def archive(fake_http):
+    # FW_Fish_Counts.zip as the EA serves it, with a member that isn't needed
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('FW_Fish_Counts.csv', 'SITE_ID,SPECIES\n001,Trout\n')
+        zip_file.writestr('README.txt', 'Not needed')
+    fake_http.append(FakeResponse(200, buffer.getvalue()))
+    return fake_http
+
+
+@pytest.fixture
+def data(tmp_path):
+    (tmp_path / 'work').mkdir()
+    return EAEcologyAndFishData('EA_survey_sites', 'fish',
+                                types.SimpleNamespace(working_dir=str(tmp_path / 'work')))
+
+
+def test_member_read_from_archive(data, archive, tmp_path):
+    datafile = data.get_datafile('FW_Fish_Counts.zip', 'FW_Fish_Counts.csv')
+
+    assert isinstance(datafile, zipfile.Path)
+    with EAEcologyAndFishData.open_datafile(datafile) as input_file:
+        assert input_file.read() == b'SITE_ID,SPECIES\n001,Trout\n'
+    assert archive.requests[0][0] == EAEcologyAndFishData.fish_and_bio_url + 'FW_Fish_Counts.zip'
+    # Nothing was extracted
+    assert not any(name.endswith('.csv') or name.endswith('.txt')
+                   for (_, _, names) in os.walk(tmp_path) for name in names)
+
+
+def test_member_extracted(data, archive, monkeypatch, tmp_path):
+    monkeypatch.setattr(EAEcologyAndFishData, 'extract_archives', True)
+    datafile = data.get_datafile('FW_Fish_Counts.zip', 'FW_Fish_Counts.csv')
+
+    # A Windows path to the extracted member
+    assert isinstance(datafile, str) and datafile.endswith('\\FW_Fish_Counts\\FW_Fish_Counts.csv')
+    assert sorted(name for (_, _, names) in os.walk(tmp_path) for name in names
+                  if os.path.splitext(name)[1] not in ['.zip', '.json', '.lock']) == \
+        ['FW_Fish_Counts.csv', 'README.txt']
@@ -0,0 +1,52 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import time
+
+
+# Related third party imports
+import pytest
+import requests
+
+
+# Local application imports
+
+
+ea_water_qual_sample_data = pytest.importorskip('ea_water_qual_sample_data')
+EAWaterQualSampleData = ea_water_qual_sample_data.EAWaterQualSampleData
+GeoData = ea_water_qual_sample_data.GeoData
+
+
+@pytest.fixture
+def samples_api(monkeypatch):
+    # sample.json stand-in: SP-<n> has n samples, and SP-13 can't be got
+    def http_get_json(url, **kwargs):
+        notation = url.split('samplingPoint=')[1].split('&')[0]
+        number = int(notation.split('-')[1])
+        if number == 13:
+            raise requests.HTTPError('503 Server Error')
+        time.sleep(0.001 * (number % 5)) # Replies arrive out of order
+        return {'items': [{'sampleDateTime': f'20{number:02}-01-01'}] * number}
+
+    monkeypatch.setattr(GeoData, 'http_get_json', staticmethod(http_get_json))
+    monkeypatch.setattr(EAWaterQualSampleData, 'max_samples_in_flight', 4)
+
+
+def test_results_in_order_of_notations(samples_api):
+    notations = [f'SP-{number}' for number in range(20)]
+    failed = []
+    results = EAWaterQualSampleData.get_site_samples(
+        notations, lambda index, samples: (notations[index], len(samples)), failed)
+
+    assert len(results) == 20
+    assert results[0] is None # No samples
+    assert results[13] is None
+    assert failed == ['SP-13']
+    assert [result for result in results if result is not None] == \
+        [(f'SP-{number}', number) for number in range(1, 20) if number != 13]
+
+
+def test_site_row_errors_raised(samples_api):
+    def site_row(index, samples):
+        raise ValueError('bad samples')
+
+    with pytest.raises(ValueError):
+        EAWaterQualSampleData.get_site_samples(['SP-1', 'SP-2'], site_row)
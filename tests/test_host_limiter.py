@@ -0,0 +1,152 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import threading
+import time
+import types
+
+
+# Related third party imports
+import pytest
+import requests
+
+
+# Local application imports
+from http_client import HostLimiter
+
+
+def response(status_code=200, retried_statuses=()):
+    # Stands in for a requests.Response, with the statuses urllib3 retried before it
+    history = [types.SimpleNamespace(status=status) for status in retried_statuses]
+    return types.SimpleNamespace(status_code=status_code,
+                                 raw=types.SimpleNamespace(retries=types.SimpleNamespace(history=history)))
+
+
+def round_trip(limiter, responses, elapsed=0.1):
+    # Make len(<responses>) requests at once, then release them with <responses>
+    tests = [limiter.acquire() for _ in responses]
+    for (test, reply) in zip(tests, responses):
+        limiter.release(elapsed, reply, test)
+
+
+@pytest.fixture
+def quick_breaker(monkeypatch):
+    monkeypatch.setattr(HostLimiter, 'breaker_cooldown', 0.05)
+    monkeypatch.setattr(HostLimiter, 'breaker_max_cooldown', 0.2)
+
+
+def test_slow_start_doubles_up_to_max():
+    limiter = HostLimiter('example.com', 40)
+    assert limiter.limit == HostLimiter.initial_limit
+    round_trip(limiter, [response()] * 8)
+    assert limiter.limit == 16
+    round_trip(limiter, [response()] * 16)
+    assert limiter.limit == 32
+    round_trip(limiter, [response()] * 32)
+    assert limiter.limit == 40
+    assert limiter.stats['peak limit'] == 40
+
+
+def test_strain_halves_then_grows_by_one():
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [response(503)] * 2 + [response()] * 6)
+    assert limiter.limit == 4
+    assert not limiter.slow_start
+    assert limiter.stats['decreases'] == 1
+    round_trip(limiter, [response()] * 4)
+    assert limiter.limit == 5
+
+
+def test_odd_error_does_not_cut_limit():
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [response(503)] + [response()] * 7)
+    assert limiter.limit == 16
+    assert limiter.stats['strained'] == 1
+
+
+def test_retried_strain_counts():
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [response(200, [429, 503])] * 2 + [response()] * 6)
+    assert limiter.stats['strained'] == 4
+    assert limiter.limit == 4
+
+
+def test_limit_held_while_slow():
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [response()], elapsed=0.01) # Fastest seen
+    limit = limiter.limit
+    round_trip(limiter, [response()] * limit, elapsed=1.0)
+    assert limiter.limit == limit
+    assert not limiter.slow_start
+
+
+def test_limit_bounds_requests_in_flight():
+    limiter = HostLimiter('example.com', 2)
+    assert limiter.limit == 2
+    limiter.acquire()
+    limiter.acquire()
+    third = threading.Thread(target=limiter.acquire)
+    third.start()
+    time.sleep(0.05)
+    assert third.is_alive() and limiter.in_flight == 2
+    limiter.release(0.1, response(), False)
+    third.join(1)
+    assert not third.is_alive() and limiter.in_flight == 2
+
+
+def test_breaker_opens_then_closes_on_success(quick_breaker):
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [None] * HostLimiter.breaker_threshold) # Could not connect
+    assert limiter.stats['breaker opens'] == 1
+    assert limiter.open_until > time.monotonic()
+
+    start = time.monotonic()
+    test = limiter.acquire()
+    assert test
+    assert time.monotonic() - start >= 0.04 # Waited for the cooldown
+
+    # While the test request is in flight, no other request is let through
+    other = threading.Thread(target=limiter.acquire)
+    other.start()
+    time.sleep(0.05)
+    assert other.is_alive()
+
+    limiter.release(0.1, response(), test)
+    other.join(1)
+    assert not other.is_alive()
+    assert limiter.open_until == 0.0 and limiter.consecutive_opens == 0
+
+
+def test_failed_test_reopens_with_longer_cooldown(quick_breaker):
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [response(500)] * HostLimiter.breaker_threshold)
+    first_cooldown = limiter.open_until - time.monotonic()
+
+    test = limiter.acquire()
+    limiter.release(0.1, response(503), test)
+    assert limiter.stats['breaker opens'] == 2
+    assert limiter.open_until - time.monotonic() > first_cooldown
+
+
+def test_in_flight_failures_do_not_reopen(quick_breaker):
+    limiter = HostLimiter('example.com', 100)
+    tests = [limiter.acquire() for _ in range(HostLimiter.breaker_threshold + 3)]
+    for test in tests:
+        limiter.release(0.1, None, test)
+    assert limiter.stats['breaker opens'] == 1
+
+
+def test_gives_up_after_max_opens(quick_breaker, monkeypatch):
+    monkeypatch.setattr(HostLimiter, 'breaker_max_opens', 2)
+    limiter = HostLimiter('example.com', 100)
+    round_trip(limiter, [None] * HostLimiter.breaker_threshold)
+    test = limiter.acquire()
+    limiter.release(0.1, None, test)
+    with pytest.raises(requests.ConnectionError):
+        limiter.acquire()
+
+
+def test_success_resets_failure_count():
+    limiter = HostLimiter('example.com', 100)
+    for _ in range(3):
+        for reply in [None] * (HostLimiter.breaker_threshold - 1) + [response()]:
+            round_trip(limiter, [reply])
+    assert limiter.stats['breaker opens'] == 0
@@ -0,0 +1,50 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import json
+
+
+# Related third party imports
+import pytest
+
+
+# Local application imports
+from http_client import JSONItemStream
+
+
+DOCUMENT = '''{"meta": {"limit": 3, "version": [1.5, -2e3]},
+ "items" : [
+  {"@id": "http://example.com/1", "lat": 52.123456, "long": -1.5, "count": 12,
+   "big": 1.25E+10, "small": -3e-7, "zero": 0, "ok": true, "gone": null},
+  {"label": "Caf\\u00e9 \\"weir\\" \\\\ pool", "name": "Rîve", "nested": {"a": [1, 2.0, {}]}},
+  12.5,
+  -0.75e2 ,
+  false
+ ],
+ "after": 123.456}'''
+
+
+def chunked(text, size):
+    return (text[start:start + size] for start in range(0, len(text), size))
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, 100000])
+def test_items_same_as_json_loads(size):
+    assert list(JSONItemStream(chunked(DOCUMENT, size), 'items')) == json.loads(DOCUMENT)['items']
+
+
+def test_number_split_after_point_and_exponent():
+    # Each chunk boundary leaves a valid, but truncated, number in the buffer
+    chunks = ['{"items": [12.', '5, 3e', '4, 7', '0, 1.0E', '+2]}']
+    assert list(JSONItemStream(chunks, 'items')) == [12.5, 3e4, 70, 100.0]
+
+
+def test_empty_and_missing_arrays():
+    assert list(JSONItemStream(chunked('{"items": [ ]}', 1), 'items')) == []
+    assert list(JSONItemStream(chunked('{"meta": {"count": 10}}', 1), 'items')) == []
+    assert list(JSONItemStream(chunked('{}', 1), 'items')) == []
+
+
+def test_truncated_json_raises():
+    with pytest.raises(ValueError):
+        list(JSONItemStream(chunked('{"items": [1, 2', 1), 'items'))
+    with pytest.raises(ValueError):
+        list(JSONItemStream(chunked('{"items": [{"a": 1}', 1), 'items'))
@@ -0,0 +1,142 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+
+
+# Related third party imports
+import numpy
+import pandas
+import pytest
+
+
+# Local application imports
+
+
+ea_water_qual_sample_data = pytest.importorskip('ea_water_qual_sample_data')
+EAWaterQualSampleData = ea_water_qual_sample_data.EAWaterQualSampleData
+
+
+def test_summarise_samples():
+    # As the API returns them: not in date order
+    samples = pandas.DataFrame([('SP-2', '2005-03-01T10:00:00', 'AUDIT'),
+                                ('SP-1', '2010-01-01T09:00:00', 'PLANNED'),
+                                ('SP-1', '2001-06-01T09:00:00', 'UNPLANNED'),
+                                ('SP-1', None, 'PLANNED'),
+                                ('SP-1', '2010-11-30T09:00:00', 'PLANNED'),
+                                (None, '2003-01-01T09:00:00', 'PLANNED')],
+                               columns=['notation', 'sampleDateTime', 'purpose'])
+    site_stats = EAWaterQualSampleData.summarise_samples(samples)
+
+    assert list(site_stats.index) == ['SP-1', 'SP-2']
+    # Purpose of the first sample given, as the per-site API path takes it
+    assert list(site_stats['purpose']) == ['PLANNED', 'AUDIT']
+    # Undated samples are counted, as the per-site API path counts them
+    assert list(site_stats['num_samples']) == [4, 1]
+    assert list(site_stats['first_sample']) == ['2001-06-01T09:00:00', '2005-03-01T10:00:00']
+    assert list(site_stats['recent_sample']) == ['2010-11-30T09:00:00', '2005-03-01T10:00:00']
+    assert site_stats.loc['SP-1', ['2001', '2005', '2010']].tolist() == [1, 0, 2]
+
+
+def test_sample_years():
+    sample_date_times = pandas.Series(['2001-06-01T09:00:00', None, 'not a date', '2010'])
+    assert EAWaterQualSampleData.sample_years(sample_date_times).tolist() == [2001, 2010]
+
+
+def test_count_years():
+    site_years = [numpy.array([2003, 2001, 2003]), numpy.zeros(0, dtype=int), numpy.array([2005])]
+    counts = EAWaterQualSampleData.count_years(site_years)
+
+    # Every year from the earliest to the latest, even those with no samples anywhere
+    assert list(counts.columns) == ['2001', '2002', '2003', '2004', '2005']
+    assert counts.values.tolist() == [[1, 0, 2, 0, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 1]]
+
+
+@pytest.mark.parametrize('num_sites', [0, 2])
+def test_count_years_with_no_years(num_sites):
+    counts = EAWaterQualSampleData.count_years([numpy.zeros(0, dtype=int)] * num_sites)
+    assert list(counts.index) == list(range(num_sites))
+    assert list(counts.columns) == []
+
+
+def test_year_columns():
+    columns = ['notation', '2003', 'purpose', 2001]
+    assert EAWaterQualSampleData.year_columns(columns) == ['2001', '2002', '2003']
+    assert EAWaterQualSampleData.year_columns(['notation', 'purpose']) == []
+    assert EAWaterQualSampleData.year_columns([]) == []
+
+
+def test_years_to_rows():
+    dataframe = pandas.DataFrame({'notation': ['SP-2', 'SP-1'], '2001': [1, 0], '2002': [0, 3]})
+    rows = EAWaterQualSampleData.years_to_rows(dataframe, ['2001', '2002'])
+
+    # Rows stay in the order of the sites, then of the years
+    assert rows.values.tolist() == [['SP-2', '2001', 1], ['SP-2', '2002', 0],
+                                    ['SP-1', '2001', 0], ['SP-1', '2002', 3]]
+
+
+def test_years_to_rows_with_no_years():
+    dataframe = pandas.DataFrame({'notation': ['SP-1'], 'purpose': ['PLANNED']})
+    rows = EAWaterQualSampleData.years_to_rows(dataframe, [])
+    assert list(rows.columns) == ['notation', 'purpose', 'year', 'annual_sample_count']
+    assert rows.empty
+
+
+
+@pytest.fixture
+def site_samples(monkeypatch):
+    # Samples as sample.json gives them, SP-2 with none and SP-4 with none dated
+    samples = {'SP-1': [{'sampleDateTime': '2001-06-01T09:00:00', 'purpose': {'label': 'PLANNED'}},
+                        {'sampleDateTime': None, 'purpose': {'label': 'UNPLANNED'}},
+                        {'sampleDateTime': '2003-01-01T09:00:00', 'purpose': {'label': 'AUDIT'}},
+                        {'sampleDateTime': '2003-05-01T09:00:00', 'purpose': {'label': 'AUDIT'}}],
+               'SP-2': [],
+               'SP-3': [{'sampleDateTime': '2002-02-01T09:00:00', 'purpose': {'label': 'AUDIT'}}],
+               'SP-4': [{'sampleDateTime': None, 'purpose': {'label': 'PLANNED'}}]}
+    monkeypatch.setattr(EAWaterQualSampleData, 'get_site_samples',
+                        staticmethod(lambda notations, site_row, failed=None:
+                                     [site_row(i, samples[notation]) if samples[notation] else None
+                                      for (i, notation) in enumerate(notations)]))
+    return samples
+
+
+def bulk_site_stats(samples):
+    # The statistics get_bulk_site_stats() makes of the same samples, one row per sample
+    return EAWaterQualSampleData.summarise_samples(pandas.DataFrame(
+        [(notation, sample['sampleDateTime'], sample['purpose']['label'])
+         for (notation, site_samples) in samples.items() for sample in site_samples],
+        columns=['notation', 'sampleDateTime', 'purpose']))
+
+
+SITES = pandas.DataFrame({'notation': ['SP-1', 'SP-2', 'SP-3', 'SP-4'], 'lat': [54.0, 54.1, 54.2, 54.3]})
+
+
+@pytest.mark.parametrize('stats_columns, year_counts', [(['purpose', 'num_samples'], 'columns'),
+                                                        (['purpose'], 'rows'),
+                                                        (['num_samples', 'first_sample', 'recent_sample'], None)])
+def test_bulk_path_same_as_per_site_path(stats_columns, year_counts, site_samples):
+    from_samples = EAWaterQualSampleData.build_site_dataframe(SITES, None, stats_columns, year_counts)
+    from_bulk = EAWaterQualSampleData.build_site_dataframe(SITES, bulk_site_stats(site_samples),
+                                                           stats_columns, year_counts)
+
+    assert list(from_bulk.columns) == list(from_samples.columns)
+    assert from_bulk.values.tolist() == from_samples.values.tolist()
+    assert set(from_samples['notation']) == {'SP-1', 'SP-3', 'SP-4'}
+
+
+@pytest.mark.parametrize('year_counts', ['columns', 'rows'])
+def test_build_site_dataframe_counts_years_on_both_paths(year_counts, site_samples):
+    site_stats = bulk_site_stats(site_samples)
+    from_samples = EAWaterQualSampleData.build_site_dataframe(SITES, None, ['purpose', 'num_samples'], year_counts)
+    from_stats = EAWaterQualSampleData.build_site_dataframe(SITES, site_stats, ['purpose', 'num_samples'], year_counts)
+
+    if year_counts == 'columns':
+        expected = [['SP-1', 54.0, 'PLANNED', 4, 1, 0, 2],
+                    ['SP-3', 54.2, 'AUDIT', 1, 0, 1, 0],
+                    ['SP-4', 54.3, 'PLANNED', 1, 0, 0, 0]]
+    else:
+        expected = [['SP-1', 54.0, 'PLANNED', 4, '2001', 1], ['SP-1', 54.0, 'PLANNED', 4, '2002', 0],
+                    ['SP-1', 54.0, 'PLANNED', 4, '2003', 2], ['SP-3', 54.2, 'AUDIT', 1, '2001', 0],
+                    ['SP-3', 54.2, 'AUDIT', 1, '2002', 1], ['SP-3', 54.2, 'AUDIT', 1, '2003', 0],
+                    ['SP-4', 54.3, 'PLANNED', 1, '2001', 0], ['SP-4', 54.3, 'PLANNED', 1, '2002', 0],
+                    ['SP-4', 54.3, 'PLANNED', 1, '2003', 0]]
+    assert from_samples.values.tolist() == expected
+    assert from_stats.values.tolist() == expected
+    assert list(from_samples.columns) == list(from_stats.columns)
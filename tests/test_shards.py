@@ -0,0 +1,98 @@
+# Standard library imports (https://docs.python.org/3/py-modindex.html)
+import json
+import os
+import types
+
+
+# Related third party imports
+import pandas
+import pytest
+
+
+# Local application imports
+
+
+ea_water_qual_sample_data = pytest.importorskip('ea_water_qual_sample_data')
+EAWaterQualSampleData = ea_water_qual_sample_data.EAWaterQualSampleData
+GeoData = ea_water_qual_sample_data.GeoData
+
+
+class SampleHistory(EAWaterQualSampleData):
+    # Stands in for a sample history class, whose get_data() sets occurrences_list_of_dicts
+    url_records = 'http://example.com/sampling-point'
+    occurrences_list_of_dicts = []
+
+
+def site(notation, area=None):
+    item = {'notation': notation}
+    if area:
+        item['area'] = {'@id': f'http://environment.data.gov.uk/water-quality/id/ea-area/{area}'}
+    return item
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(SampleHistory, 'occurrences_list_of_dicts', [])
+    return SampleHistory('EA_water_qual_archives', 'sampling_history',
+                         types.SimpleNamespace(working_dir=str(tmp_path)))
+
+
+def run_shard(history, shard, sites):
+    # As shard_feature_service.py run, with a dataframe of a row per site
+    history.sites_filter = shard
+    SampleHistory.occurrences_list_of_dicts = sites
+    history.dataframe = pandas.DataFrame({'notation': [item['notation'] for item in sites]})
+    history.save_partial()
+    history.sites_filter = ''
+
+
+def test_plan_and_merge(history, monkeypatch):
+    sites = [site('SP-1', '1-1'), site('SP-2', '3-34'), site('SP-3', '1-1')]
+    monkeypatch.setattr(GeoData, 'get_all_items', staticmethod(lambda url, fields: sites))
+    assert history.plan_shards('area') == ['area=1-1', 'area=3-34']
+
+    run_shard(history, 'area=1-1', [sites[0], sites[2]])
+    run_shard(history, 'area=3-34', [sites[1]])
+    history.load_partials()
+    assert list(history.dataframe['notation']) == ['SP-1', 'SP-2', 'SP-3']
+
+
+def test_sites_in_no_shard_stop_the_plan(history, monkeypatch, capsys):
+    sites = [site('SP-1', '1-1'), site('SP-2'), site('SP-3')]
+    monkeypatch.setattr(GeoData, 'get_all_items', staticmethod(lambda url, fields: sites))
+    with pytest.raises(SystemExit):
+        history.plan_shards('area')
+    assert '2 of 3 sampling points have no area' in capsys.readouterr().out
+    assert not os.path.exists(os.path.join(history.shards_dir(), 'plan.json'))
+
+
+def test_merge_stops_if_shards_got_other_than_planned(history, monkeypatch):
+    sites = [site('SP-1', '1-1'), site('SP-2', '3-34'), site('SP-3', '1-1')]
+    monkeypatch.setattr(GeoData, 'get_all_items', staticmethod(lambda url, fields: sites))
+    history.plan_shards('area')
+    with open(os.path.join(history.shards_dir(), 'plan.json'), 'r') as input_file:
+        assert json.load(input_file)['sites'] == 3
+
+    # SP-3 moved out of area 1-1 between the plan and the run
+    run_shard(history, 'area=1-1', [sites[0]])
+    run_shard(history, 'area=3-34', [sites[1]])
+    with pytest.raises(SystemExit):
+        history.load_partials()
+
+
+def test_merge_fills_years_shards_lack(history, monkeypatch):
+    sites = [site('SP-1', '1-1'), site('SP-2', '3-34')]
+    monkeypatch.setattr(GeoData, 'get_all_items', staticmethod(lambda url, fields: sites))
+    history.plan_shards('area')
+
+    # Shards with samples in different years, one row per site and year
+    for (shard, notation, year) in [('area=1-1', 'SP-1', '2001'), ('area=3-34', 'SP-2', '2003')]:
+        history.sites_filter = shard
+        SampleHistory.occurrences_list_of_dicts = [site(notation)]
+        history.dataframe = pandas.DataFrame({'notation': [notation], 'year': [year],
+                                              'annual_sample_count': [4]})
+        history.save_partial()
+    history.load_partials()
+
+    assert history.dataframe.values.tolist() == [['SP-1', '2001', 4], ['SP-1', '2002', 0], ['SP-1', '2003', 0],
+                                                 ['SP-2', '2001', 0], ['SP-2', '2002', 0], ['SP-2', '2003', 4]]